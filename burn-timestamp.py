@@ -24,6 +24,7 @@ Burned images are copied to stampimages/ folder.
 
 import glob
 import errno
+import multiprocessing
 import os
 import time
 import sys
@@ -49,27 +50,86 @@ Y_POSITION = "10"
 
 OUTPUT_DIRECTORY = 'stampimages'
 
+FONT_SIZE = 80
+
+# Caches of get_font(), stamp_position() and render_stamp()
+_font_cache = {}
+_position_cache = {}
+_stamp_cache = {}
+
 
 def draw_stamp(img, mod_time):
     stamp = time.strftime(STAMP_FORMAT, time.localtime(mod_time + TIME_OFFSET_SECONDS))
 
     width, height = img.size
-    font = ImageFont.truetype(FONT_PATH, 80)
+    x, y = stamp_position(width, height)
+    overlay, (left, top) = render_stamp(stamp, FONT_SIZE)
+
+    # Paste the stamp (with alpha layer) onto the original image, only the
+    # area of the text is touched.
+    img.paste(overlay, (x + left, y + top), overlay)
+
 
-    watermark = Image.new("RGBA", img.size)
-    draw = ImageDraw.Draw(watermark)
+def get_font(size):
+    """Returns font of given size. Fonts are loaded only once."""
+    if size not in _font_cache:
+        _font_cache[size] = ImageFont.truetype(FONT_PATH, size)
+    return _font_cache[size]
 
-    position = (eval(X_POSITION.format(width=width).replace(' ', '')),
-                eval(Y_POSITION.format(height=height).replace(' ', '')))
-    draw.text(position, stamp, fill=STAMP_COLOR, font=font)
 
-    mask = watermark.convert("L").point(lambda x: min(x, STAMP_ALPHA))
-    # Apply this mask to the watermark image, using the alpha filter to
+def stamp_position(width, height):
+    """Returns position of the stamp text in image of given size. Position
+    strings are evaluated only once per image size.
+    """
+    key = (width, height)
+    if key not in _position_cache:
+        _position_cache[key] = (
+            eval(X_POSITION.format(width=width).replace(' ', '')),
+            eval(Y_POSITION.format(height=height).replace(' ', '')))
+    return _position_cache[key]
+
+
+def render_stamp(stamp, size):
+    """Returns tuple (overlay, offset). Overlay is an RGBA image which is
+    only as big as the text. Offset tells where the overlay is located
+    relative to the text position. Overlays are rendered once per text.
+    """
+    key = (stamp, size)
+    if key in _stamp_cache:
+        return _stamp_cache[key]
+
+    font = get_font(size)
+    # Text is drawn from the offset to the size, getbbox() is not available
+    # in the Pillow versions which support Python 2.
+    left, top = font.getoffset(stamp)
+    right, bottom = font.getsize(stamp)
+    overlay = Image.new("RGBA", (right - left, bottom - top))
+    draw = ImageDraw.Draw(overlay)
+    draw.text((-left, -top), stamp, fill=STAMP_COLOR, font=font)
+
+    mask = overlay.convert("L").point(lambda x: min(x, STAMP_ALPHA))
+    # Apply this mask to the overlay image, using the alpha filter to
     # make it transparent
-    watermark.putalpha(mask)
+    overlay.putalpha(mask)
+
+    # Amount of different stamps is small, e.g. minutes of a day.
+    _stamp_cache[key] = (overlay, (left, top))
+    return _stamp_cache[key]
+
 
-    # Paste the watermark (with alpha layer) onto the original imag
-    img.paste(watermark, None, watermark)
+def stamp_image(task):
+    """Opens image, stamps it with modification time and saves it to
+    new_path. task is tuple (mod_time, path, new_path). Run in worker
+    processes, so each process keeps its own font and stamp caches.
+    """
+    mod_time, path, new_path = task
+
+    # Open old image and stamp it with modification time
+    img = Image.open(path)
+    img.convert('RGBA')
+    draw_stamp(img, mod_time)
+    img.save(new_path)
+    return new_path
 
 
 def mkdirp(path):
@@ -136,21 +196,25 @@ def main():
     else:
         print('Created directory %s' % OUTPUT_DIRECTORY)
 
-    start_time = time.time()
-    print('')
+    tasks = []
     for index, (mod_time, path) in enumerate(paths, start=1):
-
-        # Open old image and stamp it with modification time
-        img = Image.open(path)
-        img.convert('RGBA')
-        draw_stamp(img, mod_time)
         new_path = os.path.join(OUTPUT_DIRECTORY, str(index).zfill(10) + '.png')
-        img.save(new_path)
+        tasks.append((mod_time, path, new_path))
+
+    start_time = time.time()
+    print('')
 
+    # Decoding, stamping and encoding are done in worker processes. imap
+    # returns results in order, output names were decided above anyway.
+    pool = multiprocessing.Pool()
+    results = pool.imap(stamp_image, tasks, chunksize=4)
+    for index, new_path in enumerate(results, start=1):
         remaining = round(time_left(index, len(paths), start_time), 1)
         replace_print('Remaining:   time %s secs      images left %s' %
             (str(remaining).rjust(10), str(len(paths) - index).rjust(6)))
 
+    pool.close()
+    pool.join()
     print('')
 
 
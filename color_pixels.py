@@ -2,54 +2,117 @@
 Converts certain color pixels to another color.
 
 Usage:
-    ./color_pixels.py path_to_image "original_rgb" "new_rgba"
+    ./color_pixels.py path_to_image "original_rgb" "new_rgba" [...]
+
+Colors are comma separated, any amount of color pairs can be given.
+Pixels are compared by RGB, alpha of the original pixel is ignored.
 
 Example:
-    ./color_pixels.py image.png
+    ./color_pixels.py image.png "255,0,0" "0,0,255,255" "0,255,0" "0,0,0,0"
 """
 
 from PIL import Image
+import numpy as np
 import os
 import sys
 
+import imagebatch
+
+
+def _pack(rgb):
+    """Packs RGB values to 24-bit integers. rgb is array of shape (..., 3)."""
+    rgb = np.asarray(rgb, np.uint32)
+    return (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+
+
+def _to_rgba(color):
+    """Adds alpha 0 to RGB color, like change_pixel_colors() always has."""
+    color = tuple(color)
+    if len(color) == 3:
+        color = color + (0,)
+    return color
+
+
+def remap_colors(pixels, mapping, tolerance=0):
+    """Changes colors of RGBA array pixels in place, all colors in one pass.
+    Returns dict which tells how many pixels were changed per original color.
+
+    mapping: Dict of original RGB(A) color -> new RGBA color. If the new color
+             is RGB, alpha 0 is used.
+    tolerance: Pixels whose each channel differs at most this much from an
+               original color are changed too. If pixel is close to multiple
+               original colors, the closest one is used.
+    """
+    if not mapping:
+        return {}
+
+    originals = [tuple(color)[:3] for color in mapping]
+    news = [_to_rgba(mapping[color]) for color in mapping]
+
+    # Each distinct color of the image is compared to the original colors
+    # once. Distance is the largest difference of a channel.
+    pixel_keys = _pack(pixels[..., :3])
+    colors, inverse = np.unique(pixel_keys.ravel(), return_inverse=True)
+    distances = np.zeros((len(colors), len(originals)), np.int16)
+    for channel, shift in enumerate((16, 8, 0)):
+        values = ((colors >> shift) & 255).astype(np.int16)
+        targets = np.array([color[channel] for color in originals], np.int16)
+        np.maximum(distances, np.abs(values[:, np.newaxis] - targets),
+                   out=distances)
+
+    # Closest original color wins, then the first one.
+    closest = distances.argmin(axis=1)
+    is_close = distances[np.arange(len(colors)), closest] <= tolerance
+    color_indexes = np.where(is_close, closest, -1)
+
+    indexes = color_indexes[inverse].reshape(pixel_keys.shape)
+    matches = indexes >= 0
+
+    matched_indexes = indexes[matches]
+    pixels[matches] = np.array(news, np.uint8)[matched_indexes]
+
+    counts = np.bincount(matched_indexes, minlength=len(originals))
+    return dict((original, int(count))
+                for original, count in zip(originals, counts))
+
 
 def change_pixel_colors(image, rgba_original, rgba_new):
     """From image, change all rbga_original color pixels to rgba_new color.
     Use RGBA colors.
     """
-    pixdata = image.load()
-    # Slice the alpha away
-    rgb_original = rgba_original[:3]
+    pixels = np.array(image)
+    remap_colors(pixels, {rgba_original: rgba_new})
+    image.paste(Image.fromarray(pixels, 'RGBA'))
 
-    if len(rgba_new) == 3:
-        rgba_new = rgba_new + (0,)
 
-    for y in range(image.size[1]):
-        for x in range(image.size[0]):
-            print pixdata[x, y]
-            if pixdata[x, y][:3] == rgb_original:
-                pixdata[x, y] = rgba_new
+def parse_color(text):
+    """Parses color from text like "255,0,0"."""
+    return tuple(int(x) for x in text.split(','))
 
 
 def main():
-    if len(sys.argv) > 1 and sys.argv[1].lower() in ['-h', '--help']:
+    if len(sys.argv) < 4 or sys.argv[1].lower() in ['-h', '--help']:
         print(__doc__.strip())
         sys.exit(0)
 
     image_path = sys.argv[1]
-    print('Opening image..')
-    image = Image.open(image_path)
-    image = image.convert("RGBA")
+    colors = [parse_color(x) for x in sys.argv[2:]]
+    mapping = dict(zip(colors[::2], colors[1::2]))
 
-    rgba_original = tuple(sys.argv[2])
-    rgba_new = tuple(sys.argv[2])
+    counts = {}
 
-    print('Changing pixel colors..')
-    change_pixel_colors(image, rgba_original, rgba_new)
+    def transform(pixels):
+        for color, count in remap_colors(pixels, mapping).items():
+            counts[color] = counts.get(color, 0) + count
+        return pixels
 
-    file_body, extension = os.path.split(image_path)
+    print('Changing pixel colors..')
+    file_body, extension = os.path.splitext(image_path)
     new_imagepath = file_body + '_new.png'
-    image.save(new_imagepath, "PNG")
+    imagebatch.transform_file(transform, image_path, new_imagepath)
+
+    for color, count in counts.items():
+        print('Changed %s pixels of color %s' % (count, color))
     print('Saved new image to %s' % new_imagepath)
 
 
@@ -1,4 +1,7 @@
 """
+Converts green color of an image to transparent.
+Usage: python color_to_transparent.py image.jpg [feather]
+
 Dependencies:
 
 - OpenCV >= 2.4.4
@@ -26,37 +29,45 @@ def find_color(image, min_hsv, max_hsv):
     return cv2.inRange(hsv_image, min_hsv, max_hsv)
 
 
-def color_range_to_transparent(image, min_hsv, max_hsv):
+def color_range_to_transparent(image, min_hsv, max_hsv, feather=0):
     """Returns image where HSV color range is converted to transparent.
 
     image: OpenCV format image
     min: Minimum HSV value as np.array
     max: Maximum HSV value as np.array
+    feather: Optional width of soft edges in pixels. Mask is blurred, so
+             alpha changes gradually around the edges of the color range.
     """
     bw_image = find_color(image, min_hsv, max_hsv)
 
-    if DEBUG:
-        cv2.imwrite('debug.jpg', bw_image)
-
-    # Find the matching pixels
-    non_zero_pixels = cv2.findNonZero(bw_image)
-
     # Add alpha channel to new image
-    new_image = cv2.cvtColor(image.copy(), cv2.COLOR_BGR2BGRA)
+    new_image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
 
-    for pixel in non_zero_pixels:
-        x, y = pixel[0][1], pixel[0][0]
-        new_image[x][y] = np.array([0, 0, 0, 0], np.uint8)
+    if feather:
+        # Kernel size must be odd
+        size = 2 * feather + 1
+        bw_image = cv2.GaussianBlur(bw_image, (size, size), 0)
+        new_image[:, :, 3] = 255 - bw_image
+        new_image[bw_image == 255] = 0
+    else:
+        # Apply the mask to all matching pixels at once
+        new_image[bw_image > 0] = 0
 
-    cv2.imwrite('new.png', new_image)
+    return new_image
 
 
 def main():
     file_name = sys.argv[1]
+    feather = int(sys.argv[2]) if len(sys.argv) > 2 else 0
     image = cv2.imread(file_name)
     new_image = color_range_to_transparent(image, GREEN_RANGE_MIN,
-                                           GREEN_RANGE_MAX)
+                                           GREEN_RANGE_MAX, feather=feather)
+
+    if DEBUG:
+        cv2.imwrite('debug.jpg', find_color(image, GREEN_RANGE_MIN,
+                                            GREEN_RANGE_MAX))
 
+    cv2.imwrite('new.png', new_image)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,101 @@
+"""
+Color conversions and color range masks for whole images as NumPy arrays.
+
+Conversions work like colorsys module, but for all pixels at once. Values
+are in the same scales which greenscreen_remove_hsv.py and remove_white.py
+use: H(0-360) S(0-255) V(0-255) and H(0-360) L(0-255) S(0-255).
+"""
+
+import numpy as np
+
+
+def _split_rgb(pixels):
+    """Returns r, g, b arrays with values from 0 to 1 and their maximum,
+    minimum and a mask of gray pixels where maximum equals minimum.
+    """
+    rgb = np.asarray(pixels)[..., :3].astype(np.float64) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    return r, g, b, maxc, minc, maxc == minc
+
+
+def _hue(r, g, b, maxc, minc, is_gray):
+    """Returns hue from 0 to 1 computed like colorsys does."""
+    # Avoid division by zero for gray pixels, their hue is set to 0.
+    rangec = np.where(is_gray, 1.0, maxc - minc)
+    rc = (maxc - r) / rangec
+    gc = (maxc - g) / rangec
+    bc = (maxc - b) / rangec
+
+    h = np.where(r == maxc, bc - gc,
+                 np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = (h / 6.0) % 1.0
+    return np.where(is_gray, 0.0, h)
+
+
+def rgb_to_hsv(pixels):
+    """Converts array of RGB(A) pixels to array of H(0-360) S(0-255)
+    V(0-255) pixels. Alpha is ignored.
+    """
+    r, g, b, maxc, minc, is_gray = _split_rgb(pixels)
+    h = _hue(r, g, b, maxc, minc, is_gray)
+    # Gray pixels get saturation 0, replace divisor to avoid dividing by 0.
+    s = np.where(is_gray, 0.0, (maxc - minc) / np.where(is_gray, 1.0, maxc))
+    v = maxc
+    return np.stack([h * 360, s * 255, v * 255], axis=-1)
+
+
+def rgb_to_hls(pixels):
+    """Converts array of RGB(A) pixels to array of H(0-360) L(0-255)
+    S(0-255) pixels. Alpha is ignored.
+    """
+    r, g, b, maxc, minc, is_gray = _split_rgb(pixels)
+    h = _hue(r, g, b, maxc, minc, is_gray)
+    sumc = maxc + minc
+    l = sumc / 2.0
+
+    # Gray pixels get saturation 0, replace divisors to avoid dividing by 0.
+    rangec = maxc - minc
+    dark = rangec / np.where(is_gray, 1.0, sumc)
+    light = rangec / np.where(is_gray, 1.0, 2.0 - maxc - minc)
+    s = np.where(is_gray, 0.0, np.where(l <= 0.5, dark, light))
+    return np.stack([h * 360, l * 255, s * 255], axis=-1)
+
+
+def in_range(values, min_values, max_values):
+    """Returns boolean array which is True where all channels of values are
+    within min_values and max_values, inclusive.
+    values: Array of shape (..., channels), e.g. output of rgb_to_hsv().
+    """
+    values = np.asarray(values)
+    return np.all((values >= min_values) & (values <= max_values), axis=-1)
+
+
+def range_table(convert_func, min_values, max_values):
+    """Precomputes in_range() for all 256^3 RGB colors. Returns boolean
+    array of shape (256, 256, 256) which is indexed with [r, g, b]. Takes
+    16 MB and a few seconds to build, but makes masking an image only one
+    lookup per pixel. Use with table_mask().
+
+    convert_func: rgb_to_hsv or rgb_to_hls.
+    """
+    table = np.empty((256, 256, 256), np.bool_)
+    gb = np.indices((256, 256), np.uint8)
+    rgb = np.empty((256, 256, 3), np.uint8)
+    rgb[..., 1], rgb[..., 2] = gb
+
+    # Convert one red value at a time to keep the memory use low.
+    for r in range(256):
+        rgb[..., 0] = r
+        table[r] = in_range(convert_func(rgb), min_values, max_values)
+
+    return table
+
+
+def table_mask(pixels, table):
+    """Returns boolean mask of RGB(A) pixels using table built with
+    range_table().
+    """
+    pixels = np.asarray(pixels)
+    return table[pixels[..., 0], pixels[..., 1], pixels[..., 2]]
@@ -20,7 +20,12 @@ Example:
 """
 
 
+import bisect
+import collections
 import difflib
+import heapq
+import itertools
+import multiprocessing
 
 
 def find_best_match(item, seq, diff_func, max_diff=None):
@@ -35,15 +40,15 @@ def find_best_match(item, seq, diff_func, max_diff=None):
 
     Returns the item from 'seq' which had highest match.
     """
-    # Calculate similarity ratios for all words.
-    similarity_ratios = []
-
+    # Keep only the best match so far, 'seq' can be a lazy iterable.
+    best_match = None
     for s in seq:
         ratio = diff_func(item, s)
-        similarity_ratios.append((ratio, s))
+        if best_match is None or ratio < best_match[0]:
+            best_match = (ratio, s)
 
-    # Finds the real word which has the biggest similarity ratio
-    best_match = min(similarity_ratios, key=lambda x: x[0])
+    if best_match is None:
+        raise ValueError('seq is empty')
 
     if max_diff is not None and best_match[0] > max_diff:
         return None
@@ -51,14 +56,121 @@ def find_best_match(item, seq, diff_func, max_diff=None):
     return best_match[1]
 
 
+def find_best_matches(item, seq, diff_func, k=1, max_diff=None, stop_at=None):
+    """Finds k best matches for item 'item' from iterable 'seq'.
+    seq is consumed lazily and only k matches are kept in memory, so it can
+    be e.g. a file or a database cursor.
+
+    diff_func, max_diff: See find_best_match(). Matches which differ more
+                         than max_diff are left out.
+    stop_at: Optional number value. Stop reading 'seq' when k matches with
+             diff_func(a, b) <= stop_at have been found. For example 0 if
+             diff_func can't return negative values.
+
+    Returns list of (diff, item) tuples, best match first. Equal matches are
+    in the order they were in 'seq'.
+    """
+    # Heap of (-diff, -position, s), so the worst match kept is on top.
+    heap = []
+    good_enough = 0
+    for position, s in enumerate(seq):
+        diff = diff_func(item, s)
+        if max_diff is not None and diff > max_diff:
+            continue
+
+        entry = (-diff, -position, s)
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+        else:
+            continue
+
+        if stop_at is not None and diff <= stop_at:
+            good_enough += 1
+            if good_enough >= k:
+                break
+
+    heap.sort(reverse=True)
+    return [(-diff, s) for diff, position, s in heap]
+
+
 def find_similar_word(word, words, max_diff=None):
     """Finds best match for word from words.
     max_diff: See find_best_match()."""
     # Use difflib's SequenceMatcher as the diff_func.
     # "As a rule of thumb, a ratio() value over 0.6 means the sequences
     # are close matches". Therefore max_diff=0.4 would find close matches.
-    func = lambda x, y: 1.0 - difflib.SequenceMatcher(None, x, y).ratio()
-    return find_best_match(word, words, func, max_diff=max_diff)
+    return find_similar_word_with_stats(word, words, max_diff=max_diff)[0]
+
+
+def find_similar_word_with_stats(word, words, max_diff=None):
+    """Same as find_similar_word() but returns tuple (best_match, stats).
+
+    Full SequenceMatcher.ratio() is expensive, so each candidate is first
+    checked against cheaper upper bounds of the ratio: the length bound,
+    which is the same as real_quick_ratio(), and the character histogram
+    bound quick_ratio(). A candidate is rejected as soon as a bound shows
+    that it can't beat the best match so far or max_diff.
+
+    stats is a dict with keys:
+        candidates: Amount of words.
+        pruned_by_length: Rejected by the length bound.
+        pruned_by_quick_ratio: Rejected by quick_ratio().
+        full_ratios: Amount of full ratio() computations.
+    """
+    stats = {
+        'candidates': 0,
+        'pruned_by_length': 0,
+        'pruned_by_quick_ratio': 0,
+        'full_ratios': 0,
+    }
+    matcher = difflib.SequenceMatcher(None, word, '')
+    length = len(word)
+
+    # Diffs are compared as 1.0 - ratio to get exactly the same results as
+    # find_best_match(). On ties, the first word wins so a candidate whose
+    # bound equals the best diff can be rejected too.
+    best = None
+    for candidate in words:
+        stats['candidates'] += 1
+        threshold = best[0] if best is not None else None
+
+        total = length + len(candidate)
+        if total:
+            length_bound = 2.0 * min(length, len(candidate)) / total
+        else:
+            length_bound = 1.0
+        if _is_rejected(1.0 - length_bound, threshold, max_diff):
+            stats['pruned_by_length'] += 1
+            continue
+
+        matcher.set_seq2(candidate)
+        if _is_rejected(1.0 - matcher.quick_ratio(), threshold, max_diff):
+            stats['pruned_by_quick_ratio'] += 1
+            continue
+
+        stats['full_ratios'] += 1
+        diff = 1.0 - matcher.ratio()
+        if best is None or diff < best[0]:
+            best = (diff, candidate)
+
+    if stats['candidates'] == 0:
+        raise ValueError('words is empty')
+
+    if best is None or (max_diff is not None and best[0] > max_diff):
+        return None, stats
+
+    return best[1], stats
+
+
+def _is_rejected(min_diff, best_diff, max_diff):
+    """Returns True if candidate whose diff is at least min_diff can't
+    become the best match.
+    """
+    if best_diff is not None and min_diff >= best_diff:
+        return True
+    return max_diff is not None and min_diff > max_diff
 
 
 def find_similar_words(real_words, all_words, max_diff=None):
@@ -76,20 +188,351 @@ def find_similar_words(real_words, all_words, max_diff=None):
     return k
 
 
+# Set in each worker process of find_similar_words_parallel(), so that
+# real_words is sent to a worker only once instead of with every task.
+_worker_real_words = None
+_worker_max_diff = None
+
+
+def _init_worker(real_words, max_diff):
+    global _worker_real_words, _worker_max_diff
+    _worker_real_words = real_words
+    _worker_max_diff = max_diff
+
+
+def _find_similar_chunk(words):
+    """Returns list of (word, best_match) tuples for words."""
+    return [(word, find_similar_word(word, _worker_real_words,
+                                     max_diff=_worker_max_diff))
+            for word in words]
+
+
+def _chunks(iterable, size):
+    """Yields lists of at most size items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_similar_words_parallel(real_words, all_words, max_diff=None,
+                                processes=None, chunk_size=100):
+    """Same as find_similar_words() but all_words is split into chunks which
+    are processed in a pool of processes. Yields (word, best_match) tuples
+    as soon as chunks are ready, so the order is not preserved.
+
+    processes: Amount of worker processes, defaults to CPU core count.
+    chunk_size: Amount of words sent to a worker at a time.
+    """
+    pool = multiprocessing.Pool(processes, _init_worker,
+                                (list(real_words), max_diff))
+    try:
+        chunks = _chunks(all_words, chunk_size)
+        for results in pool.imap_unordered(_find_similar_chunk, chunks):
+            for result in results:
+                yield result
+
+        pool.close()
+    finally:
+        # Also stops workers if the caller stops iterating early.
+        pool.terminate()
+        pool.join()
+
+
+def find_similar_words_parallel(real_words, all_words, max_diff=None,
+                                processes=None, chunk_size=100):
+    """Same as find_similar_words() but uses multiple processes.
+    See iter_similar_words_parallel().
+    """
+    return dict(iter_similar_words_parallel(real_words, all_words,
+                                            max_diff=max_diff,
+                                            processes=processes,
+                                            chunk_size=chunk_size))
+
+
+def levenshtein_distance(a, b):
+    """Returns the edit distance between strings a and b. That is the
+    minimum amount of single character insertions, deletions and
+    substitutions needed to turn a into b.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous_row = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        row = [i]
+        for j, char_b in enumerate(b, start=1):
+            insert = row[j - 1] + 1
+            delete = previous_row[j] + 1
+            substitute = previous_row[j - 1] + (char_a != char_b)
+            row.append(min(insert, delete, substitute))
+        previous_row = row
+
+    return previous_row[-1]
+
+
+class BKTree(object):
+    """Burkhard-Keller tree of words. Build it once from a list of words and
+    query it as many times as needed.
+
+    Each child of a node is stored under its distance to the node. Because
+    edit distance satisfies the triangle inequality, a search only has to
+    descend to children whose distance is within max_distance of the
+    query's distance to the node. Most of the words are never compared.
+
+    distance_func: Function which returns the distance between two items
+                   as int. It must be a metric, e.g. levenshtein_distance.
+    """
+    def __init__(self, words=(), distance_func=levenshtein_distance):
+        self.distance_func = distance_func
+        # Node is a list: [word, insertion index, {distance: child node}]
+        self._root = None
+        self._size = 0
+
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        """Adds a word to the tree. Duplicates are ignored."""
+        node = [word, self._size, {}]
+        if self._root is None:
+            self._root = node
+            self._size += 1
+            return
+
+        current = self._root
+        while True:
+            distance = self.distance_func(word, current[0])
+            if distance == 0:
+                return
+
+            children = current[2]
+            if distance not in children:
+                children[distance] = node
+                self._size += 1
+                return
+
+            current = children[distance]
+
+    def search(self, word, max_distance):
+        """Returns all words which are at most max_distance away from word.
+        Returns list of (distance, word) tuples, closest first. Words with
+        equal distance are in the order they were added.
+        """
+        results = []
+        for distance, index, match in self._walk(word, max_distance):
+            results.append((distance, index, match))
+
+        results.sort()
+        return [(distance, match) for distance, index, match in results]
+
+    def find_best_match(self, word, max_distance=None):
+        """Finds the closest word. On ties, the word added first wins, like
+        in find_best_match().
+        max_distance: Optional. If no word is within this distance,
+                      None is returned.
+        """
+        best = None
+        for distance, index, match in self._walk(word, max_distance,
+                                                 shrink=True):
+            if best is None or (distance, index) < best[:2]:
+                best = (distance, index, match)
+
+        if best is None:
+            return None
+
+        return best[2]
+
+    def _walk(self, word, max_distance, shrink=False):
+        """Yields (distance, index, word) for nodes within max_distance.
+        If shrink is True, max_distance is tightened to the closest distance
+        found so far, so only the best matches are guaranteed to be yielded.
+        """
+        if self._root is None:
+            return
+
+        bound = max_distance
+        stack = [self._root]
+        while stack:
+            node_word, index, children = stack.pop()
+            distance = self.distance_func(word, node_word)
+
+            if bound is None or distance <= bound:
+                if shrink:
+                    bound = distance
+                yield distance, index, node_word
+
+            for child_distance, child in children.items():
+                if bound is None or abs(child_distance - distance) <= bound:
+                    stack.append(child)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, word):
+        return bool(self.search(word, 0))
+
+
+def find_similar_words_indexed(real_words, all_words, max_distance=None):
+    """Same as find_similar_words() but builds a BKTree of real_words once
+    and compares words by edit distance instead of SequenceMatcher.
+    max_distance: Maximum edit distance, see BKTree.find_best_match().
+    """
+    tree = BKTree(real_words)
+    k = {}
+    for word in all_words:
+        k[word] = tree.find_best_match(word, max_distance=max_distance)
+
+    return k
+
+
+class CachedMatcher(object):
+    """Caches results of a find function for a dictionary of words. Useful
+    when the same words are looked up many times.
+
+    Results are cached by (word, dictionary version, max_diff, find_func).
+    When the dictionary is changed through set_words() or add_word(), the
+    version is increased and the cache is cleared. Least recently used
+    results are dropped when there are more than max_size of them.
+
+    words: Dictionary which is passed to find_func.
+    find_func: Function find_func(word, words, max_diff=None), for example
+               find_similar_word() or spellcorrector's find_similar_word().
+    """
+    def __init__(self, words, find_func=None, max_size=10000):
+        self.words = words
+        self.find_func = find_func or find_similar_word
+        self.max_size = max_size
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = collections.OrderedDict()
+
+    def find(self, word, max_diff=None, find_func=None):
+        """Returns find_func(word, words, max_diff=max_diff), cached."""
+        find_func = find_func or self.find_func
+        key = (word, self.version, max_diff, find_func)
+
+        if key in self._cache:
+            self.hits += 1
+            # Move to be the most recently used.
+            result = self._cache.pop(key)
+            self._cache[key] = result
+            return result
+
+        self.misses += 1
+        result = find_func(word, self.words, max_diff=max_diff)
+        self._cache[key] = result
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+        return result
+
+    def set_words(self, words):
+        """Replaces the dictionary and invalidates cached results."""
+        self.words = words
+        self._invalidate()
+
+    def add_word(self, word):
+        """Appends word to the dictionary and invalidates cached results."""
+        self.words.append(word)
+        self._invalidate()
+
+    def stats(self):
+        """Returns dict of cache statistics."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._cache),
+            'version': self.version,
+        }
+
+    def _invalidate(self):
+        self.version += 1
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
 def find_closest_number(number, numbers):
     func = lambda x, y: abs(x - y)
     return find_best_match(number, numbers, func)
 
 
 def find_closest_numbers(numbers, all_numbers):
+    index = NumberIndex(numbers)
     k = {}
     for number in all_numbers:
-        best_match = find_closest_number(number, numbers)
+        best_match = index.find_closest(number)
         k[number] = best_match
 
     return k
 
 
+class NumberIndex(object):
+    """Sorted copy of numbers for finding the closest number with binary
+    search. Gives the same results as find_closest_number(): if two numbers
+    are equally close, the one which was first in numbers wins.
+    """
+    def __init__(self, numbers):
+        first_positions = {}
+        for position, number in enumerate(numbers):
+            first_positions.setdefault(number, position)
+
+        if not first_positions:
+            raise ValueError('numbers is empty')
+
+        self._numbers = sorted(first_positions)
+        self._positions = [first_positions[x] for x in self._numbers]
+
+    def find_closest(self, number):
+        """Finds the closest number in O(log n) time."""
+        i = bisect.bisect_left(self._numbers, number)
+        if i == 0:
+            return self._numbers[0]
+        if i == len(self._numbers):
+            return self._numbers[-1]
+
+        lower, higher = self._numbers[i - 1], self._numbers[i]
+        lower_diff, higher_diff = number - lower, higher - number
+        if lower_diff == higher_diff:
+            if self._positions[i - 1] < self._positions[i]:
+                return lower
+            return higher
+
+        return lower if lower_diff < higher_diff else higher
+
+    def find_closest_array(self, numbers):
+        """Finds the closest numbers for all values of array-like numbers
+        at once with NumPy. Returns NumPy array.
+        """
+        # NumPy is only needed for this method.
+        import numpy as np
+
+        queries = np.asarray(numbers)
+        values = np.asarray(self._numbers)
+        positions = np.asarray(self._positions)
+
+        higher = np.clip(np.searchsorted(values, queries), 1, len(values) - 1)
+        lower = higher - 1
+        if len(values) == 1:
+            higher = lower = np.zeros_like(higher)
+
+        lower_diff = np.abs(queries - values[lower])
+        higher_diff = np.abs(values[higher] - queries)
+        is_first = positions[lower] < positions[higher]
+        use_lower = (lower_diff < higher_diff) | (
+            (lower_diff == higher_diff) & is_first)
+
+        return np.where(use_lower, values[lower], values[higher])
+
+
 def main():
     real_words = ['apple', 'grape', 'pineapple']
     all_words = ['apple1', 'apple', 'greip', 'greb', 'grape',
@@ -104,6 +547,12 @@ def main():
     print('\nAll similar words with max_diff specified:')
     print(find_similar_words(real_words, all_words, max_diff=0.3))
 
+    print('\nAll similar words using multiple processes:')
+    print(find_similar_words_parallel(real_words, all_words))
+
+    print('\nAll similar words using BKTree with max edit distance 2:')
+    print(find_similar_words_indexed(real_words, all_words, max_distance=2))
+
     numbers = [1, 3, 10, 40, 100]
     all_numbers = [1, 1.93, 2.1, 2, 4, 6, 50, 150, 2000]
     print('\nAll close numbers:')
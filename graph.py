@@ -2,8 +2,9 @@
 Draw a random wave.
 """
 
-import Image
-import ImageDraw
+from PIL import Image
+from PIL import ImageDraw
+import numpy as np
 import math
 import random
 
@@ -47,37 +48,60 @@ def rotate(x, y, rotation):
     return new_x, new_y
 
 
-def main():
-    # Open image.
-    size = (3000, 3000)
-    width, height = size
+def wave_line(amplitude, wave_length, rotation, line_length,
+              amplitude_factor=0.999):
+    """Computes all points of a wave line at once, same as calling wave()
+    and rotate() for each x with amplitude decreasing on every step.
+
+    Returns array of shape (line_length, 2) of (x, y) coordinates.
+    """
+    x = np.arange(line_length, dtype=np.float64)
+
+    # Amplitude decreases on every cycle, also before the first dot.
+    amplitudes = amplitude * amplitude_factor ** (x + 1)
+    y = (np.sin(x * (2 * math.pi / wave_length) - math.pi / 2) + 1) / 2
+    y *= amplitudes
+
+    # Rotate all points with one matrix multiplication.
+    cos, sin = math.cos(rotation), math.sin(rotation)
+    rotation_matrix = np.array([[cos, -sin], [sin, cos]])
+    return np.dot(np.column_stack([x, y]), rotation_matrix.T)
+
+
+def render(size=(3000, 3000), line_count=300, seed=None):
+    """Draws line_count random waves starting from the center of the
+    image. Returns the image.
+    seed: Optional seed for random, the same seed draws the same image.
+    """
+    if seed is not None:
+        random.seed(seed)
+
     im = Image.new("RGB", size, 'white')
     draw = ImageDraw.Draw(im)
-
-    # Amplitude decreases on every cycle.
-    amplitude_factor = 0.999
-    starting_dot = (1500, 1500)
-    line_count = 300
+    width, height = size
+    starting_dot = (width // 2, height // 2)
 
     # Draw lines.
-    for i in xrange(line_count):
-
-        last_dot = starting_dot
+    for i in range(line_count):
         amplitude = random.randint(20, 150)
         wave_length = random.randint(300, 1000)
         rotation = random.uniform(0, 2 * math.pi)
         line_length = random.randint(300, 1500)
 
-        # Draw dots.
-        for x in xrange(line_length):
-            amplitude = amplitude * amplitude_factor
-            y = wave(x, amplitude, wave_length)
-            x, y = rotate(x, y, rotation)
-            dot = (x + starting_dot[0], y + starting_dot[1])
-            draw.line([last_dot, dot], fill='blue')
-            last_dot = dot
+        dots = wave_line(amplitude, wave_length, rotation, line_length)
+        dots += starting_dot
+
+        # Draw the whole line with one call.
+        points = [starting_dot] + [tuple(dot) for dot in dots]
+        draw.line(points, fill='blue')
 
+    return im
+
+
+def main():
+    im = render()
     im.save("graph.png")
 
+
 if __name__ == '__main__':
     main()
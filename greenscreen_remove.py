@@ -1,33 +1,50 @@
 """
 Removes greenscreen from an image.
 Usage: python greenscreen_remove.py image.jpg
+       python greenscreen_remove.py <directory or "pattern"> [output_dir]
+
+In batch mode images are processed in parallel and saved as png to
+output_dir, default is transparent/. Existing outputs are skipped.
 """
 
-from PIL import Image
+import numpy as np
 import sys
 import os
 
+import imagebatch
+
 
 GREEN_THRESHOLD = 100
 
 
+def green_mask(pixels, threshold=GREEN_THRESHOLD):
+    """Returns boolean array which is True for 'green' pixels.
+    pixels: NumPy array of shape (height, width, 3 or 4), RGB(A) uint8.
+    """
+    # Widen the type, r + b would overflow with uint8.
+    r, g, b = [pixels[..., i].astype(np.int16) for i in range(3)]
+    return (g > r + b) & (g >= threshold)
+
+
+def remove_green(pixels, threshold=GREEN_THRESHOLD):
+    """Turns each 'green' pixel of RGBA array to transparent, in place.
+    Returns the array.
+    """
+    pixels[green_mask(pixels, threshold)] = 0
+    return pixels
+
+
 def main():
-    # Load image and convert it to RGBA, so it contains alpha channel
     file_path = sys.argv[1]
+    if imagebatch.is_batch(file_path):
+        output_directory = sys.argv[2] if len(sys.argv) > 2 else \
+            imagebatch.OUTPUT_DIRECTORY
+        imagebatch.main(remove_green, file_path, output_directory)
+        return
+
+    # Turn all 'green' pixels to transparent at once
     name, ext = os.path.splitext(file_path)
-    im = Image.open(file_path)
-    im = im.convert('RGBA')
-
-    # Go through all pixels and turn each 'green' pixel to transparent
-    pix = im.load()
-    width, height = im.size
-    for x in range(width):
-        for y in range(height):
-            r, g, b, a = pix[x, y]
-            if g > r + b and g >= GREEN_THRESHOLD:
-                pix[x, y] = (0, 0, 0, 0)
-
-    im.save(name + '.png')
+    imagebatch.transform_file(remove_green, file_path, name + '.png')
 
 
 if __name__ == '__main__':
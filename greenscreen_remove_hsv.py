@@ -1,46 +1,53 @@
 """
 Removes greenscreen from an image.
 Usage: python greenscreen_remove.py image.jpg
+       python greenscreen_remove.py <directory or "pattern"> [output_directory]
+
+In batch mode images are processed in parallel and saved as png to
+output_dir, default is transparent/. Existing outputs are skipped.
 """
 
-from PIL import Image
 import sys
 import os
-import colorsys
+
+import colorspace
+import imagebatch
 
 
 GREEN_RANGE_MIN_HSV = (100, 70, 70)
 GREEN_RANGE_MAX_HSV = (150, 255, 255)
 
 
-def rgb_to_hsv(r, g ,b):
-    """Convert R(0-255) G(0-255) B(0-255) to H(0-360) S(0-255) V(0-255).
+# Mask of all RGB colors, built on first use. Batch mode builds it once in
+# each worker process. See colorspace.range_table().
+_green_table = None
+
+
+def remove_green(pixels):
+    """Turns each 'green' pixel of RGBA array to transparent, in place.
+    Returns the array.
     """
-    rgb = [x / 255.0 for x in (r, g, b)]
-    h, s, v = colorsys.rgb_to_hsv(*rgb)
-    return (h * 360, s * 255, v * 255)
+    global _green_table
+    if _green_table is None:
+        _green_table = colorspace.range_table(
+            colorspace.rgb_to_hsv, GREEN_RANGE_MIN_HSV, GREEN_RANGE_MAX_HSV)
+
+    mask = colorspace.table_mask(pixels, _green_table)
+    pixels[mask] = 0
+    return pixels
+
 
 def main():
-    # Load image and convert it to RGBA, so it contains alpha channel
     file_path = sys.argv[1]
+    if imagebatch.is_batch(file_path):
+        output_directory = sys.argv[2] if len(sys.argv) > 2 else \
+            imagebatch.OUTPUT_DIRECTORY
+        imagebatch.main(remove_green, file_path, output_directory)
+        return
+
+    # Turn all 'green' pixels to transparent at once
     name, ext = os.path.splitext(file_path)
-    im = Image.open(file_path)
-    im = im.convert('RGBA')
-
-    # Go through all pixels and turn each 'green' pixel to transparent
-    pix = im.load()
-    width, height = im.size
-    for x in range(width):
-        for y in range(height):
-            r, g, b, a = pix[x, y]
-            h, s, v = rgb_to_hsv(r, g, b)
-
-            min_h, min_s, min_v = GREEN_RANGE_MIN_HSV
-            max_h, max_s, max_v = GREEN_RANGE_MAX_HSV
-            if min_h <= h <= max_h and min_s <= s <= max_s and min_v <= v <= max_v:
-                pix[x, y] = (0, 0, 0, 0)
-
-    im.save(name + '.png')
+    imagebatch.transform_file(remove_green, file_path, name + '.png')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,226 @@
+"""
+Bounded cache which uses HistoryList to know which keys to evict.
+
+With LRU policy the keys are kept in a HistoryList: reading or writing a key
+appends it again, which moves it to be the newest, and the oldest key is
+evicted when the cache is full. With LFU policy keys are grouped by how many
+times they have been used, each group being a HistoryList, and the oldest
+key of the least used group is evicted.
+
+Example:
+    @cached(max_size=1000, ttl=60)
+    def convert(timestamp, timezone):
+        ...
+
+    convert.cache.stats()
+"""
+
+import functools
+import threading
+import time
+
+from historylist import HistoryList
+
+
+# Marks a missing value, None can be cached.
+_MISSING = object()
+
+
+class HistoryCache(object):
+    """Mapping of at most max_size items. Safe to use from multiple threads.
+
+    max_size: Maximum amount of items, None for unlimited.
+    ttl: Optional time to live of items in seconds.
+    policy: 'lru' evicts the least recently used item, 'lfu' the least
+            frequently used one. Ties in 'lfu' are evicted by recency.
+    timer: Function which returns the current time in seconds.
+    """
+    POLICIES = ('lru', 'lfu')
+
+    def __init__(self, max_size=128, ttl=None, policy='lru', timer=time.time):
+        if policy not in self.POLICIES:
+            raise ValueError('policy must be one of %s' % (self.POLICIES,))
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.policy = policy
+        self.timer = timer
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._lock = threading.RLock()
+        # Key -> (value, expiration time or None)
+        self._data = {}
+        # LRU: all keys. LFU: use count -> keys with that count
+        self._recency = HistoryList()
+        self._counts = {}
+        self._frequencies = {}
+        # LFU: smallest use count, None if it has to be looked up again.
+        self._min_count = None
+
+    def get(self, key, default=None):
+        """Returns value of key, or default if key is not in the cache."""
+        with self._lock:
+            value = self._get(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Sets value of key, evicting an item if the cache is full."""
+        with self._lock:
+            expires = None
+            if self.ttl is not None:
+                expires = self.timer() + self.ttl
+
+            # Evict before adding, so that the new key is never the victim.
+            is_full = self.max_size is not None and \
+                len(self._data) >= self.max_size
+            if key not in self._data and is_full and self._data:
+                self._delete(self._victim())
+                self.evictions += 1
+
+            self._data[key] = (value, expires)
+            self._touch(key)
+
+    def delete(self, key):
+        """Removes key from the cache. Raises KeyError if not found."""
+        with self._lock:
+            if key not in self._data:
+                raise KeyError(key)
+            self._delete(key)
+
+    def clear(self):
+        """Removes all items, statistics are kept."""
+        with self._lock:
+            self._data.clear()
+            self._recency = HistoryList()
+            self._counts.clear()
+            self._frequencies.clear()
+            self._min_count = None
+
+    def stats(self):
+        """Returns dict of cache statistics."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'size': len(self._data),
+            }
+
+    def _get(self, key):
+        """Returns value of key or _MISSING. Expired items are removed."""
+        if key not in self._data:
+            return _MISSING
+
+        value, expires = self._data[key]
+        if expires is not None and self.timer() >= expires:
+            self._delete(key)
+            self.expirations += 1
+            return _MISSING
+
+        self._touch(key)
+        return value
+
+    def _touch(self, key):
+        """Marks key as used."""
+        if self.policy == 'lru':
+            self._recency.append(key)
+            return
+
+        count = self._counts.get(key, 0)
+        if count:
+            self._remove_frequency(key, count)
+        self._counts[key] = count + 1
+        self._frequencies.setdefault(count + 1, HistoryList()).append(key)
+
+        # New key has the smallest possible count. Otherwise the smallest
+        # count only changes if the key was the last one which had it.
+        if count == 0:
+            self._min_count = 1
+        elif count == self._min_count and count not in self._frequencies:
+            self._min_count = count + 1
+
+    def _victim(self):
+        """Returns the key which should be evicted."""
+        if self.policy == 'lru':
+            return self._recency.oldest()
+
+        # Smallest count is kept up to date by _touch(), which makes
+        # evictions O(1). Only after deletes it has to be searched again.
+        if self._min_count is None:
+            self._min_count = min(self._frequencies)
+        return self._frequencies[self._min_count].oldest()
+
+    def _delete(self, key):
+        del self._data[key]
+        if self.policy == 'lru':
+            self._recency.remove(key)
+        else:
+            count = self._counts.pop(key)
+            self._remove_frequency(key, count)
+            if count == self._min_count and count not in self._frequencies:
+                self._min_count = None
+
+    def _remove_frequency(self, key, count):
+        keys = self._frequencies[count]
+        keys.remove(key)
+        if not keys:
+            del self._frequencies[count]
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._get(key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+    def __contains__(self, key):
+        """Operator 'in'. Doesn't count as use of the key."""
+        with self._lock:
+            if key not in self._data:
+                return False
+            expires = self._data[key][1]
+            return expires is None or self.timer() < expires
+
+    def __len__(self):
+        return len(self._data)
+
+
+def cached(max_size=128, ttl=None, policy='lru'):
+    """Decorator which caches return values of a function by its arguments.
+    Arguments must be hashable. The cache is available as func.cache.
+    See HistoryCache for the parameters.
+    """
+    def decorator(func):
+        cache = HistoryCache(max_size=max_size, ttl=ttl, policy=policy)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                # Called without the lock, so slow calls don't block other
+                # threads. Concurrent misses may call func more than once.
+                value = func(*args, **kwargs)
+                cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
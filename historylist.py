@@ -2,49 +2,60 @@
 Contains convenient list type which can be used in history lists.
 """
 
+import collections
+
 
 class HistoryList(object):
     """List that keeps a history of objects in chronological order. If
     existing object is appended again, it is moved to be most recently added.
 
     First item of the list is the newet, last is the oldest.
-    Note: The internal list keeps the data in reversed order. So first item
-          of that list is actually the oldest.
+    Note: The internal ordered dict keeps the data in reversed order. So
+          first key of that dict is actually the oldest.
+
+    All operations are O(1). Objects must be hashable, because they are
+    stored as keys of an ordered dict.
     """
     def __init__(self, max_length=None):
         self.max_length = max_length
-        self._history = []
+        self._history = collections.OrderedDict()
 
     def newest(self):
         """Returns the newest item in the list."""
-        return self._history[-1]
+        if not self._history:
+            raise IndexError('newest from empty list')
+        return next(reversed(self._history))
 
     def oldest(self):
         """Returns the oldest item in the list."""
-        return self._history[0]
+        if not self._history:
+            raise IndexError('oldest from empty list')
+        return next(iter(self._history))
 
     def append(self, obj):
         """Appends an object to the list."""
         # Item already exists in the list, move it to last
         if obj in self._history:
-            self._history.remove(obj)
-            self._history.append(obj)
+            del self._history[obj]
+            self._history[obj] = None
         else:
-            self._history.append(obj)
+            self._history[obj] = None
 
             # If maximum length is exceeded, drop the first item(oldest).
             if self._is_too_long():
-                self._history.pop(0)
+                self._history.popitem(last=False)
 
     def remove(self, obj):
         """Removes an object from the list."""
-        self._history.remove(obj)
+        try:
+            del self._history[obj]
+        except KeyError:
+            raise ValueError('%r is not in list' % (obj,))
 
     def _is_too_long(self):
         """Returns True if the list is too long."""
         is_infinite = self.max_length is None
-        is_too_long = len(self._history) > self.max_length
-        return not is_infinite and is_too_long
+        return not is_infinite and len(self._history) > self.max_length
 
     def __iter__(self):
         """Iterating the list will iterate the list from newest to oldest."""
@@ -53,10 +64,10 @@ class HistoryList(object):
 
     def __repr__(self):
         # This is not very efficient with big lists.
-        return repr(self._history[::-1])
+        return repr(list(self))
 
     def __str__(self):
-        return str(self._history[::-1])
+        return str(list(self))
 
     def __len__(self):
         return len(self._history)
@@ -0,0 +1,72 @@
+"""
+Benchmarks HistoryList against the old list based implementation.
+
+Usage: python historylist_benchmark.py [max_length] [operations]
+"""
+
+import random
+import sys
+import time
+
+from historylist import HistoryList
+
+
+class ListHistoryList(object):
+    """The old HistoryList, which keeps the history in a plain list. append()
+    and remove() are O(n).
+    """
+    def __init__(self, max_length=None):
+        self.max_length = max_length
+        self._history = []
+
+    def append(self, obj):
+        if obj in self._history:
+            self._history.remove(obj)
+            self._history.append(obj)
+        else:
+            self._history.append(obj)
+            if self.max_length is not None and \
+                    len(self._history) > self.max_length:
+                self._history.pop(0)
+
+    def remove(self, obj):
+        self._history.remove(obj)
+
+    def __contains__(self, item):
+        return item in self._history
+
+
+def churn(history, operations, key_count, seed=0):
+    """Appends random keys to history and removes some of them, like a
+    recently used list under heavy use. Returns elapsed seconds.
+    """
+    rand = random.Random(seed)
+    keys = [rand.randint(0, key_count) for _ in range(operations)]
+
+    start = time.time()
+    for i, key in enumerate(keys):
+        if i % 10 == 0 and key in history:
+            history.remove(key)
+        else:
+            history.append(key)
+
+    return time.time() - start
+
+
+def main():
+    max_length = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    operations = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    print('%s operations, max_length %s' % (operations, max_length))
+    for cls in (ListHistoryList, HistoryList):
+        history = cls(max_length)
+        # Fill the list first, so that the operations hit a full list.
+        for i in range(max_length):
+            history.append(-i)
+
+        elapsed = churn(history, operations, max_length * 2)
+        print('%s: %.3f secs' % (cls.__name__.ljust(16), elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+HistoryList which is saved to disk and survives restarts.
+
+Changes are written to an append-only log. Writes are buffered and synced
+to disk in groups, so there isn't a disk write for every append(). Every
+compact_every changes the whole list is written to a snapshot and the log
+is emptied. At startup the snapshot is loaded as is and only the log written
+after it is replayed.
+
+Files, where path is given to the constructor:
+    path.snapshot   JSON object {"sequence": n, "items": [oldest, .., newest]}
+    path.log        One JSON list [sequence, "a" or "r", item] per line for
+                    append() and remove(). Entries whose sequence is at most
+                    the snapshot's sequence are already in the snapshot.
+
+Items must be JSON serializable. Lists are loaded back as tuples, so that
+they are hashable.
+"""
+
+import json
+import os
+import threading
+import time
+
+from historylist import HistoryList
+
+
+def _from_json(value):
+    """Converts lists to tuples, recursively."""
+    if isinstance(value, list):
+        return tuple(_from_json(x) for x in value)
+    return value
+
+
+class PersistentHistoryList(HistoryList):
+    """HistoryList which is saved to files starting with path.
+
+    flush_every: Changes are synced to disk after this many changes..
+    flush_interval: ..or at most this many seconds after a change, from a
+                    timer thread. Unsynced changes are lost if the process
+                    crashes.
+    compact_every: Snapshot is written after this many changes.
+    """
+    def __init__(self, path, max_length=None, flush_every=100,
+                 flush_interval=1.0, compact_every=10000):
+        super(PersistentHistoryList, self).__init__(max_length)
+        self.path = path
+        self.snapshot_path = path + '.snapshot'
+        self.log_path = path + '.log'
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+
+        self._sequence = 0
+        self._log_entries = 0
+        self._buffer = []
+        self._last_flush = time.time()
+        # Timer which flushes buffered changes when there are no more.
+        self._timer = None
+        # Timer thread writes the log too.
+        self._lock = threading.RLock()
+
+        self._load()
+        self._log = open(self.log_path, 'ab')
+
+    def append(self, obj):
+        """Appends an object to the list."""
+        super(PersistentHistoryList, self).append(obj)
+        self._write('a', obj)
+
+    def remove(self, obj):
+        """Removes an object from the list."""
+        super(PersistentHistoryList, self).remove(obj)
+        self._write('r', obj)
+
+    def flush(self):
+        """Writes buffered changes to the log and syncs it to disk."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if self._buffer:
+                self._log.write(b''.join(self._buffer))
+                self._log.flush()
+                os.fsync(self._log.fileno())
+                self._buffer = []
+            self._last_flush = time.time()
+        # Timer which flushes buffered changes when there are no more.
+        self._timer = None
+        # Timer thread writes the log too.
+        self._lock = threading.RLock()
+
+    def compact(self):
+        """Writes the whole list to the snapshot and empties the log."""
+        with self._lock:
+            self.flush()
+
+            snapshot = {'sequence': self._sequence,
+                        'items': list(self._history)}
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Rename is atomic, so the old or the new snapshot is always
+            # intact. If the process dies before the log is emptied, its
+            # entries are skipped by their sequence numbers at the next
+            # load.
+            os.rename(temp_path, self.snapshot_path)
+
+            self._log.close()
+            self._log = open(self.log_path, 'wb')
+            self._log_entries = 0
+
+    def close(self):
+        """Syncs buffered changes to disk and closes the log."""
+        with self._lock:
+            self.flush()
+            self._log.close()
+
+    def _write(self, operation, obj):
+        with self._lock:
+            self._sequence += 1
+            self._log_entries += 1
+            line = json.dumps([self._sequence, operation, obj]) + '\n'
+            self._buffer.append(line.encode('utf-8'))
+
+            is_time = time.time() - self._last_flush >= self.flush_interval
+            if len(self._buffer) >= self.flush_every or is_time:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval,
+                                              self.flush)
+                # Open list doesn't keep the process running.
+                self._timer.daemon = True
+                self._timer.start()
+
+            if self._log_entries >= self.compact_every:
+                self.compact()
+
+    def _load(self):
+        """Loads the snapshot and replays the log after it."""
+        snapshot_sequence = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            snapshot_sequence = self._sequence = snapshot['sequence']
+
+            # Snapshot is already in order, no need to append one by one.
+            for item in snapshot['items']:
+                self._history[_from_json(item)] = None
+            # Files may have been written with a larger max_length.
+            while self._is_too_long():
+                self._history.popitem(last=False)
+
+        if not os.path.exists(self.log_path):
+            return
+
+        valid_size = 0
+        with open(self.log_path, 'rb') as f:
+            for line in f:
+                # Last line may not be written completely before a crash.
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line.decode('utf-8'))
+                    sequence, operation, item = entry
+                except (ValueError, TypeError):
+                    break
+                valid_size += len(line)
+
+                if sequence <= snapshot_sequence:
+                    continue
+
+                item = _from_json(item)
+                if operation == 'a':
+                    super(PersistentHistoryList, self).append(item)
+                elif item in self._history:
+                    # Item may have been dropped already by a smaller
+                    # max_length than the one it was written with.
+                    super(PersistentHistoryList, self).remove(item)
+                self._sequence = sequence
+                self._log_entries += 1
+
+        # Drop the broken line, otherwise new entries would follow it.
+        if valid_size != os.path.getsize(self.log_path):
+            with open(self.log_path, 'ab') as f:
+                f.truncate(valid_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
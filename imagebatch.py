@@ -0,0 +1,160 @@
+"""
+Runs an image transform for many images in a pool of worker processes.
+Used by greenscreen_remove.py, greenscreen_remove_hsv.py and remove_white.py.
+
+Transform is a function which takes an RGBA image as NumPy array and returns
+the new array. Each worker decodes, transforms and encodes whole images, so
+only paths are sent between the processes.
+"""
+
+from PIL import Image
+import numpy as np
+import glob
+import multiprocessing
+import os
+
+import tiledimage
+
+
+OUTPUT_DIRECTORY = 'transparent'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+# Uncompressed images with more pixels than this are processed in strips,
+# see tiledimage.py. As RGBA array such image takes 200 MB.
+LARGE_IMAGE_PIXELS = 50 * 1000 * 1000
+
+
+def is_batch(path):
+    """Returns True if path is a directory or a glob pattern."""
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+def find_images(path):
+    """Returns sorted image paths in directory or matching glob pattern."""
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in os.listdir(path)
+                 if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS]
+    else:
+        paths = glob.glob(path)
+
+    return sorted(p for p in paths if os.path.isfile(p))
+
+
+def output_path(path, output_directory):
+    """Returns path of the transformed png image in output_directory."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_directory, name + '.png')
+
+
+def transform_file(transform, path, new_path):
+    """Opens image from path, transforms it and saves it as png to new_path.
+    Returns new_path.
+    """
+    im = tiledimage.open_image(path)
+    width, height = im.size
+    if width * height > LARGE_IMAGE_PIXELS and tiledimage.can_read_strips(im):
+        return tiledimage.transform_file(transform, path, new_path)
+
+    # Opened again with PIL's decompression bomb check, the whole image is
+    # decoded at once.
+    im = Image.open(path)
+
+    # Load image and convert it to RGBA, so it contains alpha channel
+    im = im.convert('RGBA')
+
+    pixels = transform(np.array(im))
+    # Saved under temporary name, so that a killed run doesn't leave a
+    # truncated image which would be skipped as existing on the next run.
+    temp_path = new_path + '.tmp'
+    try:
+        Image.fromarray(pixels, 'RGBA').save(temp_path, 'PNG')
+        os.rename(temp_path, new_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return new_path
+
+
+def process_images(transform, paths, output_directory=OUTPUT_DIRECTORY,
+                   processes=None, max_in_flight=None, skip_existing=True):
+    """Transforms images to output_directory using multiple processes.
+    Yields tuple (path, error) for each image in the order of paths. error
+    is None if the image was saved, otherwise the exception which failed
+    it. One broken image doesn't stop the others. Images whose output path
+    is taken by an earlier image, e.g. x.jpg after x.png, fail with
+    ValueError.
+
+    processes: Amount of worker processes, defaults to CPU core count.
+    max_in_flight: Maximum amount of images queued to the workers at a time.
+                   Defaults to twice the amount of processes.
+    skip_existing: Skip images whose output already exists.
+    """
+    if not os.path.isdir(output_directory):
+        os.makedirs(output_directory)
+
+    processes = processes or multiprocessing.cpu_count()
+    max_in_flight = max_in_flight or processes * 2
+    pool = multiprocessing.Pool(processes)
+
+    def result(path, task):
+        if isinstance(task, Exception):
+            return path, task
+        try:
+            task.get(timeout=None)
+        except Exception as e:
+            return path, e
+        return path, None
+
+    # Like in process_map.py, but only max_in_flight tasks are queued at a
+    # time to keep memory use bounded with huge amounts of images.
+    tasks = []
+    # Output path -> image which is saved to it.
+    sources = {}
+    try:
+        for path in paths:
+            new_path = output_path(path, output_directory)
+            # Checked first, the output of the earlier image may already
+            # exist when the later one is reached.
+            if new_path in sources:
+                error = ValueError('%s has the same output %s as %s' %
+                                   (path, new_path, sources[new_path]))
+                tasks.append((path, error))
+                continue
+            sources[new_path] = path
+
+            if skip_existing and os.path.exists(new_path):
+                continue
+
+            if len(tasks) >= max_in_flight:
+                yield result(*tasks.pop(0))
+
+            args = [transform, path, new_path]
+            tasks.append((path, pool.apply_async(transform_file, args)))
+
+        while tasks:
+            yield result(*tasks.pop(0))
+
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def main(transform, path, output_directory=OUTPUT_DIRECTORY):
+    """Command line batch mode of the scripts."""
+    paths = find_images(path)
+    print('Processing %s images to %s..' % (len(paths), output_directory))
+
+    count = 0
+    failed = 0
+    for image_path, error in process_images(transform, paths,
+                                            output_directory):
+        if error is None:
+            count += 1
+        else:
+            failed += 1
+            print('Failed to process %s: %s' % (image_path, error))
+
+    skipped = len(paths) - count - failed
+    print('Saved %s new images, skipped %s, failed %s' %
+          (count, skipped, failed))
@@ -1,10 +1,15 @@
 """
 Collection of random mathematical functions.
+
+Functions with plural names take NumPy arrays of N points, shape (N, 2),
+and compute the results for all points at once.
 """
 
 
 import math
 
+import numpy as np
+
 
 def rotate(x, y, rotation, rotationOrigin=(0, 0)):
     """Rotate coordinates around specified origin.
@@ -65,3 +70,48 @@ def angleBetween(centerPoint, pointA, pointB):
 
 def radToDeg(angle):
     return angle * 180 / math.pi
+
+
+def rotatePoints(points, rotation, rotationOrigin=(0, 0)):
+    """Same as rotate() but for array of points. Returns array of shape
+    (N, 2).
+    """
+    cos = math.cos(rotation)
+    sin = math.sin(rotation)
+    rotationMatrix = np.array([[cos, -sin], [sin, cos]])
+
+    points = np.asarray(points, dtype=np.float64)
+    return np.dot(points, rotationMatrix.T) + rotationOrigin
+
+
+def distancesBetweenPoints(pointsA, pointsB):
+    """Same as distanceBetweenPoints() but row-wise for arrays of points.
+    Either one can also be a single point. Returns array of N distances.
+    """
+    diff = np.asarray(pointsA, dtype=np.float64) - pointsB
+    return np.hypot(diff[..., 0], diff[..., 1])
+
+
+def distanceMatrix(pointsA, pointsB=None):
+    """Calculates distances between all pairs of points. Returns array of
+    shape (len(pointsA), len(pointsB)) where [i, j] is the distance between
+    pointsA[i] and pointsB[j]. If pointsB is not given, distances between
+    points of pointsA are calculated.
+
+    Note: The matrix takes N * M * 8 bytes, split big sets into chunks.
+    """
+    pointsA = np.asarray(pointsA, dtype=np.float64)
+    pointsB = pointsA if pointsB is None else np.asarray(pointsB, np.float64)
+    return distancesBetweenPoints(pointsA[:, np.newaxis], pointsB[np.newaxis])
+
+
+def anglesBetween(centerPoints, pointsA, pointsB):
+    """Same as angleBetween() but row-wise for arrays of points.
+    Returns array of N angles in radians.
+    """
+    a = distancesBetweenPoints(centerPoints, pointsB)
+    b = distancesBetweenPoints(centerPoints, pointsA)
+    c = distancesBetweenPoints(pointsA, pointsB)
+
+    cosAngle = (c**2 - a**2 - b**2) / (2 * a * b)
+    return np.arccos(cosAngle)
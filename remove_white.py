@@ -1,48 +1,54 @@
 """
 Removes whitescreen from an image.
 Usage: python whitescreen_remove.py image.jpg
+       python whitescreen_remove.py <directory or "pattern"> [output_dir]
+
+In batch mode images are processed in parallel and saved as png to
+output_dir, default is transparent/. Existing outputs are skipped.
 """
 
-from PIL import Image
 import sys
 import os
-import colorsys
+
+import colorspace
+import imagebatch
 
 
 WHITE_RANGE_MIN_HLS = (0, 140, 0)
 WHITE_RANGE_MAX_HLS = (360, 255, 255)
 
 
-def rgb_to_hls(r, g ,b):
-    """Convert R(0-255) G(0-255) B(0-255) to H(0-360) L(0-255) S(0-255).
+# Mask of all RGB colors, built on first use. Batch mode builds it once in
+# each worker process. See colorspace.range_table().
+_white_table = None
+
+
+def remove_white(pixels):
+    """Turns each 'white' pixel of RGBA array to transparent, in place.
+    Returns the array.
     """
-    rgb = [x / 255.0 for x in (r, g, b)]
-    h, s, v = colorsys.rgb_to_hls(*rgb)
-    return (h * 360, s * 255, v * 255)
+    global _white_table
+    if _white_table is None:
+        _white_table = colorspace.range_table(
+            colorspace.rgb_to_hls, WHITE_RANGE_MIN_HLS, WHITE_RANGE_MAX_HLS)
+
+    mask = colorspace.table_mask(pixels, _white_table)
+    pixels[mask] = 0
+    return pixels
 
 
 def main():
-    # Load image and convert it to RGBA, so it contains alpha channel
     file_path = sys.argv[1]
-    name, ext = os.path.splitext(file_path)
-    im = Image.open(file_path)
-    im = im.convert('RGBA')
-
-    # Go through all pixels and turn each 'white' pixel to transparent
-    pix = im.load()
-    width, height = im.size
-    for x in range(width):
-        for y in range(height):
-            r, g, b, a = pix[x, y]
-            h, l, s = rgb_to_hls(r, g, b)
+    if imagebatch.is_batch(file_path):
+        output_directory = sys.argv[2] if len(sys.argv) > 2 else \
+            imagebatch.OUTPUT_DIRECTORY
+        imagebatch.main(remove_white, file_path, output_directory)
+        return
 
-            min_h, min_l, min_s = WHITE_RANGE_MIN_HLS
-            max_h, max_l, max_s = WHITE_RANGE_MAX_HLS
-            if min_h <= h <= max_h and min_l <= l <= max_l and min_s <= s <= max_s:
-                pix[x, y] = (0, 0, 0, 0)
-
-    im.save(name + '.png')
+    # Turn all 'white' pixels to transparent at once
+    name, ext = os.path.splitext(file_path)
+    imagebatch.transform_file(remove_white, file_path, name + '.png')
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,131 @@
+"""
+Spatial index for nearest point queries in 2-dimensional space.
+
+Points are in format (x, y) like in mathematics.py. Instead of calculating
+distanceBetweenPoints() to every point, KDTree splits the points into
+halves by x or y coordinate and only visits the halves which can contain
+closer points than the ones found so far.
+
+Example:
+    tree = KDTree([(0, 0), (1, 1), (5, 5)])
+    tree.nearest((4, 4))  # (1.414.., 2), point 2 is (5, 5)
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+
+class KDTree(object):
+    """k-d tree of 2-dimensional points. Build is O(n log n) and queries
+    are O(log n) on average.
+
+    Queries return distances and indexes of the points in the list which
+    was given to the constructor. The points are also available as
+    tree.points.
+
+    leaf_size: Maximum amount of points in a leaf node. Points of a leaf are
+               compared one by one, which is faster than splitting further.
+    """
+    def __init__(self, points, leaf_size=16):
+        self.points = [tuple(point) for point in points]
+        self.leaf_size = leaf_size
+
+        coordinates = np.array(self.points, dtype=np.float64).reshape(-1, 2)
+        indexes = np.arange(len(self.points))
+        self._root = self._build(coordinates, indexes)
+
+    def _build(self, coordinates, indexes):
+        """Returns node for points indexes. Leaf node is a list of (x, y,
+        index) tuples, other nodes are tuples (axis, split, left, right)
+        where left contains the points whose coordinate on axis is at most
+        split and right the rest.
+        """
+        if len(indexes) <= self.leaf_size:
+            return [(x, y, index) for (x, y), index
+                    in zip(coordinates[indexes].tolist(), indexes.tolist())]
+
+        # Split by the axis along which the points are spread the most.
+        points = coordinates[indexes]
+        spread = points.max(axis=0) - points.min(axis=0)
+        axis = int(np.argmax(spread))
+
+        middle = len(indexes) // 2
+        order = np.argpartition(points[:, axis], middle)
+        split = float(points[order[middle], axis])
+
+        left = indexes[order[:middle]]
+        right = indexes[order[middle:]]
+        return (axis, split,
+                self._build(coordinates, left),
+                self._build(coordinates, right))
+
+    def nearest(self, point):
+        """Returns tuple (distance, index) of the point closest to point, or
+        None if the tree is empty.
+        """
+        results = self.k_nearest(point, 1)
+        return results[0] if results else None
+
+    def k_nearest(self, point, k):
+        """Returns list of (distance, index) tuples of the k closest points,
+        closest first.
+        """
+        x, y = point
+        # Heap of (-squared distance, -index), the worst match is on top.
+        heap = []
+
+        def visit(node):
+            if isinstance(node, list):
+                for px, py, index in node:
+                    entry = (-((px - x) ** 2 + (py - y) ** 2), -index)
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
+                return
+
+            axis, split, left, right = node
+            diff = (x, y)[axis] - split
+            near, far = (left, right) if diff <= 0 else (right, left)
+            visit(near)
+            if len(heap) < k or diff ** 2 <= -heap[0][0]:
+                visit(far)
+
+        if k > 0:
+            visit(self._root)
+
+        heap.sort(reverse=True)
+        return [(math.sqrt(-d2), -index) for d2, index in heap]
+
+    def within_radius(self, point, radius):
+        """Returns list of (distance, index) tuples of all points which are
+        at most radius away from point, closest first.
+        """
+        x, y = point
+        radius2 = radius ** 2
+        results = []
+
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                for px, py, index in node:
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if d2 <= radius2:
+                        results.append((math.sqrt(d2), index))
+                continue
+
+            axis, split, left, right = node
+            diff = (x, y)[axis] - split
+            if diff <= radius:
+                stack.append(left)
+            if diff >= -radius:
+                stack.append(right)
+
+        results.sort()
+        return results
+
+    def __len__(self):
+        return len(self.points)
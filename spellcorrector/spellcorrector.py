@@ -1,7 +1,24 @@
+"""
+Interactive spell corrector.
 
+Usage:
+    python spellcorrector.py [--symspell]
+
+--symspell: Use SymSpell engine which answers with hash lookups instead of
+            scanning the dictionary. Startup takes longer.
+"""
+
+import os
+import sys
 
 import Levenshtein
-from fuzzyfind import find_best_match
+from fuzzyfind import CachedMatcher, find_best_match
+from symspell import SymSpell
+from wordindex import WordIndex, build_index_from_file, to_text
+
+
+WORDS_PATH = 'wordsEn.txt'
+INDEX_PATH = 'wordsEn.idx'
 
 
 def find_similar_word(word, words, max_diff=None):
@@ -11,16 +28,65 @@ def find_similar_word(word, words, max_diff=None):
     return find_best_match(word, words, func, max_diff=max_diff)
 
 
+def find_similar_word_indexed(word, index, max_diff=None):
+    """Same as find_similar_word() but searches a WordIndex.
+
+    Buckets are searched in order of the best ratio their words can have.
+    Levenshtein ratio of words with lengths a and b is at most
+    1 - |a - b| / (a + b), so the search stops when no remaining bucket can
+    beat the best match found. On ties, alphabetically first word wins.
+    """
+    # Index contains unicode words, Levenshtein doesn't accept mixed types.
+    word = to_text(word)
+    length = len(word)
+
+    def min_diff(bucket_length):
+        total = length + bucket_length
+        return abs(length - bucket_length) / float(total) if total else 0
+
+    buckets = sorted((min_diff(x), x) for x in range(index.max_length + 1))
+
+    best = None
+    for bucket_min_diff, bucket_length in buckets:
+        if best is not None and bucket_min_diff > best[0]:
+            break
+        if max_diff is not None and bucket_min_diff > max_diff:
+            break
+
+        for candidate in index.words_of_length(bucket_length):
+            diff = 1.0 - Levenshtein.ratio(word, candidate)
+            if best is None or (diff, candidate) < best:
+                best = (diff, candidate)
+
+    if best is None or (max_diff is not None and best[0] > max_diff):
+        return None
+
+    return best[1]
+
+
 def main():
-    words = open('wordsEn.txt').read().splitlines()
-    wordset = set(words)
+    is_stale = (not os.path.exists(INDEX_PATH) or
+                os.path.getmtime(INDEX_PATH) < os.path.getmtime(WORDS_PATH))
+    if is_stale:
+        print('Building index %s..' % INDEX_PATH)
+        build_index_from_file(WORDS_PATH, INDEX_PATH)
+    index = WordIndex(INDEX_PATH)
+
+    if '--symspell' in sys.argv[1:]:
+        print('Building SymSpell dictionary..')
+        symspell = SymSpell(index)
+        find = symspell.find_similar_word
+    else:
+        # Same misspellings come up often, don't scan the index again.
+        matcher = CachedMatcher(index, find_similar_word_indexed)
+        find = matcher.find
 
     while True:
-        word = raw_input('Write word: ').strip()
-        if word in wordset:
+        word = to_text(raw_input('Write word: ').strip())
+        if word in index:
             print('Word is correct.')
         else:
-            print('Did you mean %s?' % find_similar_word(word, words))
+            print('Did you mean %s?' % find(word))
 
 
 if __name__ == '__main__':
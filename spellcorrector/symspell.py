@@ -0,0 +1,103 @@
+"""
+Spelling correction with precomputed deletion neighbourhoods (SymSpell).
+
+Words which are within edit distance n of each other always share a variant
+which is produced by deleting at most n characters from both. All deletion
+variants of the dictionary are precomputed into a dict, so correcting a word
+only needs to generate the deletions of the word itself and look them up.
+The candidates found are then verified with the real edit distance.
+
+Only the deletions of the first prefix_length characters are stored. Words
+within distance n have prefixes within distance n too, so no candidate is
+lost, but the amount of variants of long words stays small.
+"""
+
+import Levenshtein
+
+
+class SymSpell(object):
+    """Dictionary which answers queries with hash lookups.
+
+    max_distance: Largest edit distance which can be queried. Build time and
+                  memory grow quickly with it, 2 is usually enough.
+    prefix_length: Deletions are generated from this many first characters
+                   of words, None for whole words. Shorter prefix saves
+                   memory but gives more candidates to verify.
+    """
+    def __init__(self, words=(), max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._words = set()
+        # Deletion variant -> words which produce it.
+        self._deletes = {}
+
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        """Adds word to the dictionary."""
+        if word in self._words:
+            return
+
+        self._words.add(word)
+        prefix = word[:self.prefix_length]
+        for variant in deletes(prefix, self.max_distance):
+            self._deletes.setdefault(variant, []).append(word)
+
+    def lookup(self, word, max_distance=None):
+        """Returns list of (distance, word) tuples of dictionary words which
+        are at most max_distance away from word. Closest words are first,
+        ties are in alphabetical order.
+        max_distance: Defaults to max_distance given to constructor, can't
+                      be larger than that.
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        if max_distance > self.max_distance:
+            raise ValueError('max_distance can be at most %s' %
+                             self.max_distance)
+
+        candidates = set()
+        for variant in deletes(word[:self.prefix_length], max_distance):
+            candidates.update(self._deletes.get(variant, ()))
+
+        results = []
+        for candidate in candidates:
+            distance = Levenshtein.distance(word, candidate)
+            if distance <= max_distance:
+                results.append((distance, candidate))
+
+        results.sort()
+        return results
+
+    def find_similar_word(self, word, max_distance=None):
+        """Returns the closest word or None if nothing is close enough."""
+        results = self.lookup(word, max_distance=max_distance)
+        if not results:
+            return None
+        return results[0][1]
+
+    def __contains__(self, word):
+        return word in self._words
+
+    def __len__(self):
+        return len(self._words)
+
+
+def deletes(word, max_distance):
+    """Returns set of all variants of word where at most max_distance
+    characters are deleted. The word itself is included.
+    """
+    variants = set([word])
+    edge = [word]
+    for _ in range(max_distance):
+        next_edge = []
+        for variant in edge:
+            for i in range(len(variant)):
+                deleted = variant[:i] + variant[i + 1:]
+                if deleted not in variants:
+                    variants.add(deleted)
+                    next_edge.append(deleted)
+        edge = next_edge
+
+    return variants
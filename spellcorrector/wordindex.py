@@ -0,0 +1,161 @@
+"""
+Compiles a word list into an on-disk index which is memory-mapped when used.
+
+Words are sorted and bucketed by their length, so checking a word only needs
+a binary search inside one bucket. Nothing is parsed at startup and the
+operating system shares the mapped pages between all processes which use
+the same index file.
+
+Usage:
+    python wordindex.py wordsEn.txt wordsEn.idx
+
+File format, integers are unsigned 32-bit little-endian:
+    magic       b'WIDX0001'
+    count       Amount of words.
+    max_length  Length of the longest word.
+    buckets     max_length + 2 integers. Words which have length n are the
+                word numbers from buckets[n] to buckets[n + 1] - 1.
+    offsets     count + 1 integers. Word number i is located at
+                data[offsets[i]:offsets[i + 1]].
+    data        UTF-8 encoded words concatenated together.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+
+MAGIC = b'WIDX0001'
+INT = struct.Struct('<I')
+
+
+def to_text(word):
+    if isinstance(word, bytes):
+        return word.decode('utf-8')
+    return word
+
+
+def build_index(words, index_path):
+    """Writes words to index_path. Duplicates are removed."""
+    words = sorted(set(to_text(w) for w in words), key=lambda w: (len(w), w))
+    max_length = len(words[-1]) if words else 0
+
+    buckets = [0] * (max_length + 2)
+    for word in words:
+        buckets[len(word) + 1] += 1
+    for length in range(1, len(buckets)):
+        buckets[length] += buckets[length - 1]
+
+    encoded = [w.encode('utf-8') for w in words]
+    offsets = [0]
+    for word in encoded:
+        offsets.append(offsets[-1] + len(word))
+
+    # Written to a temporary file which is renamed over the old index.
+    # Processes which have the old index mapped keep using the old file,
+    # and processes building the index at the same time don't mix writes.
+    fd, temp_path = tempfile.mkstemp(
+        prefix=os.path.basename(index_path) + '.',
+        dir=os.path.dirname(os.path.abspath(index_path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(INT.pack(len(words)))
+            f.write(INT.pack(max_length))
+            f.write(struct.pack('<%dI' % len(buckets), *buckets))
+            f.write(struct.pack('<%dI' % len(offsets), *offsets))
+            f.write(b''.join(encoded))
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp() makes the file readable only by its owner.
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, index_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def build_index_from_file(words_path, index_path):
+    """Builds index from a word list which has one word per line."""
+    with open(words_path, 'rb') as f:
+        words = f.read().splitlines()
+    build_index(words, index_path)
+
+
+class WordIndex(object):
+    """Read-only view of an index file written by build_index()."""
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        with open(index_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError('%s is not a word index' % index_path)
+
+        pos = len(MAGIC)
+        self._count = INT.unpack_from(self._map, pos)[0]
+        self.max_length = INT.unpack_from(self._map, pos + INT.size)[0]
+        self._buckets_pos = pos + 2 * INT.size
+        self._offsets_pos = self._buckets_pos + \
+            (self.max_length + 2) * INT.size
+        self._data_pos = self._offsets_pos + (self._count + 1) * INT.size
+
+    def close(self):
+        self._map.close()
+
+    def bucket(self, length):
+        """Returns (first, end) word numbers of words which have length."""
+        if not 0 <= length <= self.max_length:
+            return 0, 0
+        pos = self._buckets_pos + length * INT.size
+        return (INT.unpack_from(self._map, pos)[0],
+                INT.unpack_from(self._map, pos + INT.size)[0])
+
+    def words_of_length(self, length):
+        """Iterates words which have given length, in sorted order."""
+        first, end = self.bucket(length)
+        for i in range(first, end):
+            yield self._word(i).decode('utf-8')
+
+    def _word(self, i):
+        """Returns word number i as UTF-8 encoded bytes."""
+        pos = self._offsets_pos + i * INT.size
+        start = INT.unpack_from(self._map, pos)[0]
+        end = INT.unpack_from(self._map, pos + INT.size)[0]
+        return self._map[self._data_pos + start:self._data_pos + end]
+
+    def __contains__(self, word):
+        """Binary searches the bucket of words with the same length."""
+        word = to_text(word)
+        low, high = self.bucket(len(word))
+        encoded = word.encode('utf-8')
+        while low < high:
+            middle = (low + high) // 2
+            if self._word(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.bucket(len(word))[1] and self._word(low) == encoded
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._word(i).decode('utf-8')
+
+    def __len__(self):
+        return self._count
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__.strip())
+        sys.exit(1)
+
+    build_index_from_file(sys.argv[1], sys.argv[2])
+    print('Wrote index to %s' % sys.argv[2])
+
+
+if __name__ == '__main__':
+    main()
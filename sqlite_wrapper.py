@@ -1,70 +1,263 @@
 """
 Wrapper to add data to database with SQLite.
 Provides a bit easier access to database than sqlite itself.
-Table is created when not found. Database is saved after every delete_data()
-and insert_data().
+Table is created when not found. Database is saved after every delete_data(),
+insert_data() and insert_many(), unless they are called inside transaction().
 
 For example usage, see bottom of the file.
 """
 
+import contextlib
 import sqlite3 as sqlite
+import threading
+import time
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+
+# Named sets of PRAGMA settings for Database's profile argument.
+# WAL journal lets readers work while a writer is writing. With WAL,
+# synchronous NORMAL can lose the latest transactions on power loss but
+# never corrupts the database. Negative cache_size is in kilobytes.
+PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # Only for loading data which can be loaded again if the machine crashes
+    # in the middle, database may be corrupted then.
+    'bulk-load': {
+        'journal_mode': 'MEMORY',
+        'synchronous': 'OFF',
+        'cache_size': -512000,
+        'mmap_size': 1024 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+}
+
+# Settings are applied in this order, journal_mode must be set first.
+PRAGMA_NAMES = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size',
+                'temp_store')
+
+
+def set_pragmas(conn, pragmas):
+    """Apply dict of PRAGMA settings to connection."""
+    for name in PRAGMA_NAMES:
+        if name in pragmas:
+            conn.execute('PRAGMA %s = %s' % (name, pragmas[name]))
 
 
 class Database(object):
     """
     Wrapper for SQLite. Provides even easier access to database for other
     modules.
+
+    profile: Optional name of settings in PROFILES.
+    pragmas: Optional dict of PRAGMA settings which override the profile's.
+             Keys must be in PRAGMA_NAMES. If neither is given, SQLite's
+             defaults are used.
     """
 
-    def __init__(self, db_filename, db_tablename, fields, ins_params):
+    def __init__(self, db_filename, db_tablename, fields, ins_params,
+                 profile=None, pragmas=None):
 
         self.db_filename = db_filename  # Databases filename
         self.db_tablename = db_tablename  # Table's name
         self.fields = fields  # Fields to create new table
         self.insert_params = ins_params  # Params used in INSERT commands
 
+        # INSERT command is the same every time, format it only once.
+        # sqlite3 caches the prepared statement by the SQL string.
+        self._insert_sql = 'INSERT INTO %s VALUES %s' % (db_tablename,
+                                                         ins_params)
+        self._transaction_depth = 0
+
+        self.pragmas = {}  # PRAGMA settings applied when connecting
+        if profile is not None:
+            self.pragmas.update(PROFILES[profile])
+        self.pragmas.update(pragmas or {})
+        for name in self.pragmas:
+            if name not in PRAGMA_NAMES:
+                raise ValueError('Unknown pragma: %s' % name)
+
         self._connect()
 
     def insert_data(self, values):
         """Insert data into table and save.
         values is tuple, that contains every mandatory value in table.
         """
-        table = self.db_tablename
-        params = self.insert_params
-        sql_cmd = 'INSERT INTO %s VALUES %s' % (table, params)
-
         # Insert given parameters to database.
-        self._cursor.execute(sql_cmd, values)
-        self._conn.commit()  # Save changes to db.
+        self._cursor.execute(self._insert_sql, values)
+        self._commit()  # Save changes to db.
 
-    def delete_data(self, where=None):
+    def insert_many(self, rows):
+        """Insert many rows into table in one transaction and save.
+        rows is iterable of tuples like values in insert_data().
+        """
+        self._cursor.executemany(self._insert_sql, rows)
+        self._commit()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Context manager which saves changes only once, at the end of the
+        with block. If an exception is raised, changes are rolled back.
+        Transactions can be nested, the outermost one saves the changes.
+
+            with db.transaction():
+                db.delete_data()
+                db.insert_many(rows)
+        """
+        self._transaction_depth += 1
+        try:
+            yield self
+        except:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._conn.rollback()
+            raise
+
+        self._transaction_depth -= 1
+        self._commit()
+
+    def delete_data(self, where=None, params=()):
         """Delete data matching where and save.
         If where is not specified, all records are deleted.
+        params are bound to ? placeholders in where.
         """
         sql_cmd = 'DELETE FROM %s' % self.db_tablename
         if where is not None:
             sql_cmd += ' WHERE %s' % where
 
-        self._cursor.execute(sql_cmd)  # Delete matching
-        self._conn.commit()  # Save changes
+        self._cursor.execute(sql_cmd, params)  # Delete matching
+        self._commit()  # Save changes
 
-    def select_data(self, where=None):
+    def select_data(self, where=None, params=()):
         """Select data from self.db_tablename, matching where statement,
         return as list.
 
         If where is not specified, all rows are returned.
+        params are bound to ? placeholders in where, e.g.
+        select_data('receiver = ?', ('jack',)).
         """
-        sql_cmd = 'SELECT * FROM %s' % self.db_tablename
+        return list(self.iter_data(where, params))
+
+    def iter_data(self, where=None, params=(), columns=None, batch_size=1000):
+        """Same as select_data(), but returns an iterator which fetches
+        batch_size rows at a time. Memory use doesn't depend on the amount
+        of rows.
+
+        columns: Optional list of column names to select, default is all.
+        """
+        sql_cmd = self._select_sql(where, columns)
+
+        # Own cursor, so other queries can be made while iterating.
+        cursor = self._conn.cursor()
+        cursor.execute(sql_cmd, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cursor.close()
+
+    def select_page(self, key, after=None, limit=1000, where=None, params=(),
+                    columns=None):
+        """Select at most limit rows ordered by column key, return tuple
+        (rows, after). To get the next page, pass the returned after back.
+        rows is empty when there are no more rows. Rows which have the same
+        key are ordered by rowid, so key doesn't have to be unique. Unlike
+        OFFSET, this doesn't get slower for later pages when key is
+        indexed, e.g. the primary key.
+        """
+        rows = self._page_cursor(key, after, limit, where, params,
+                                 columns).fetchall()
+        if not rows:
+            return [], after
+
+        # Key and rowid are selected before the columns.
+        return [row[2:] for row in rows], tuple(rows[-1][:2])
+
+    def iter_pages(self, key, limit=1000, where=None, params=(),
+                   columns=None):
+        """Yields all matching rows as pages from select_page()."""
+        after = None
+        while True:
+            page, after = self.select_page(key, after, limit, where, params,
+                                           columns)
+            if not page:
+                return
+            yield page
+
+    def get_pragmas(self):
+        """Return dict of current values of the settings in PRAGMA_NAMES, as
+        SQLite reports them.
+        """
+        values = {}
+        for name in PRAGMA_NAMES:
+            row = self._cursor.execute('PRAGMA %s' % name).fetchone()
+            values[name] = row[0]
+        return values
+
+    # Non-public
+
+    def _select_sql(self, where=None, columns=None):
+        """Return SELECT command for where and columns."""
+        columns = ', '.join(columns) if columns else '*'
+        sql_cmd = 'SELECT %s FROM %s' % (columns, self.db_tablename)
         if where is not None:
             sql_cmd += ' WHERE %s' % where
-        return [x for x in self._cursor.execute(sql_cmd)]
+        return sql_cmd
 
-    # Non-public
+    def _page_cursor(self, key, after, limit, where, params, columns):
+        """Return cursor which has executed the query of select_page().
+        Rows start with key and rowid, followed by columns.
+        """
+        params = list(params)
+        conditions = []
+        if where is not None:
+            conditions.append('(%s)' % where)
+        if after is not None:
+            after_key, after_rowid = after
+            if after_key is None:
+                # NULL keys are first and can't be compared with >.
+                conditions.append('(%s IS NOT NULL OR rowid > ?)' % key)
+                params.append(after_rowid)
+            else:
+                conditions.append('(%s > ? OR (%s = ? AND rowid > ?))' %
+                                  (key, key))
+                params.extend([after_key, after_key, after_rowid])
+
+        where = ' AND '.join(conditions) or None
+        columns = [key, 'rowid'] + list(columns or ['*'])
+        sql_cmd = self._select_sql(where, columns)
+        sql_cmd += ' ORDER BY %s, rowid LIMIT ?' % key
+        params.append(limit)
+
+        return self._conn.cursor().execute(sql_cmd, params)
+
+    def _commit(self):
+        """Save changes, unless inside transaction()."""
+        if self._transaction_depth == 0:
+            self._conn.commit()
 
     def _connect(self):
         """Connect to database."""
         self._conn = sqlite.connect(self.db_filename)
         self._cursor = self._conn.cursor()
+        set_pragmas(self._conn, self.pragmas)
 
         self._create_table()  # Creates table if it does not exist!
 
@@ -86,6 +279,240 @@ class Database(object):
                 raise
 
 
+class ConnectionPool(object):
+    """
+    Fixed amount of connections to SQLite database, shared by threads.
+    SQLite allows only one writer at a time, so there is one connection for
+    writing and the rest are for reading. Use WAL journal mode, otherwise
+    readers are blocked while writing.
+
+    Note: Each connection to ':memory:' would be a different database.
+    """
+
+    def __init__(self, db_filename, readers=4, pragmas=None):
+        self.db_filename = db_filename
+        self.pragmas = pragmas or {}
+        self.size = readers + 1
+
+        # Statistics
+        self.checkouts = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.wait_time = 0.0  # Total seconds waited for connections
+        self.max_wait_time = 0.0
+
+        self._lock = threading.Lock()
+        self._writer = queue.Queue()
+        self._writer.put(self._new_connection())
+        self._readers = queue.Queue()
+        for i in range(readers):
+            self._readers.put(self._new_connection())
+
+    def checkout(self, write=False, timeout=None):
+        """Take a connection from the pool, waiting at most timeout seconds
+        for one to become free. Return it with checkin().
+        """
+        connections = self._writer if write else self._readers
+        start = time.time()
+        try:
+            conn = connections.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise sqlite.OperationalError('Timed out waiting for connection')
+
+        waited = time.time() - start
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+
+        return conn
+
+    def checkin(self, conn, write=False):
+        """Return connection taken with checkout() to the pool. Changes
+        which were not committed are rolled back.
+        """
+        conn.rollback()
+        with self._lock:
+            self.in_use -= 1
+        (self._writer if write else self._readers).put(conn)
+
+    @contextlib.contextmanager
+    def connection(self, write=False, timeout=None):
+        """Context manager which checks out a connection and returns it."""
+        conn = self.checkout(write, timeout)
+        try:
+            yield conn
+        finally:
+            self.checkin(conn, write)
+
+    def stats(self):
+        """Return dict of pool statistics."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_time': self.wait_time,
+                'max_wait_time': self.max_wait_time,
+            }
+
+    def close(self):
+        """Close all connections. All connections must be checked in."""
+        for connections in (self._writer, self._readers):
+            while not connections.empty():
+                connections.get().close()
+
+    def _new_connection(self):
+        # Connections move between threads, each thread uses its own cursor.
+        conn = sqlite.connect(self.db_filename, check_same_thread=False)
+        set_pragmas(conn, self.pragmas)
+        return conn
+
+
+class PooledDatabase(Database):
+    """
+    Database which can be used from multiple threads at the same time.
+    Each call checks out a connection from a ConnectionPool: writes use the
+    writer connection, reads use one of the reader connections. Inside
+    transaction() the thread keeps the writer connection, and reads use it
+    too so they see the changes.
+
+    readers: Amount of reader connections.
+    timeout: Seconds to wait for a free connection, None waits forever.
+    profile: See Database. Defaults to 'durable', which uses WAL.
+    """
+
+    def __init__(self, db_filename, db_tablename, fields, ins_params,
+                 readers=4, timeout=None, profile='durable', pragmas=None):
+        self.readers = readers
+        self.timeout = timeout
+        # Connection, cursor and transaction state of each thread.
+        self._local = threading.local()
+
+        super(PooledDatabase, self).__init__(db_filename, db_tablename,
+                                             fields, ins_params,
+                                             profile=profile, pragmas=pragmas)
+
+    def insert_data(self, values):
+        with self._writing():
+            super(PooledDatabase, self).insert_data(values)
+
+    def insert_many(self, rows):
+        with self._writing():
+            super(PooledDatabase, self).insert_many(rows)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self._writing():
+            with super(PooledDatabase, self).transaction():
+                yield self
+
+    def delete_data(self, where=None, params=()):
+        with self._writing():
+            super(PooledDatabase, self).delete_data(where, params)
+
+    def iter_data(self, where=None, params=(), columns=None, batch_size=1000):
+        # Connection is kept until the iteration is finished.
+        with self._reading():
+            rows = super(PooledDatabase, self).iter_data(where, params,
+                                                         columns, batch_size)
+            for row in rows:
+                yield row
+
+    def select_page(self, key, after=None, limit=1000, where=None, params=(),
+                    columns=None):
+        with self._reading():
+            return super(PooledDatabase, self).select_page(
+                key, after, limit, where, params, columns)
+
+    def iter_pages(self, key, limit=1000, where=None, params=(),
+                   columns=None):
+        with self._reading():
+            pages = super(PooledDatabase, self).iter_pages(
+                key, limit, where, params, columns)
+            for page in pages:
+                yield page
+
+    def get_pragmas(self):
+        with self._reading():
+            return super(PooledDatabase, self).get_pragmas()
+
+    # Non-public
+
+    # Database's methods use these, they point to the connection which the
+    # current thread has checked out.
+
+    @property
+    def _conn(self):
+        return getattr(self._local, 'writer', None) or self._local.reader
+
+    @property
+    def _cursor(self):
+        if getattr(self._local, 'writer', None) is not None:
+            return self._local.writer_cursor
+        return self._local.reader_cursor
+
+    @property
+    def _transaction_depth(self):
+        return getattr(self._local, 'transaction_depth', 0)
+
+    @_transaction_depth.setter
+    def _transaction_depth(self, value):
+        self._local.transaction_depth = value
+
+    def _writing(self):
+        """Check out the writer connection for the current thread, unless
+        it already has it.
+        """
+        return self._using('writer')
+
+    def _reading(self):
+        """Check out a reader connection for the current thread, unless it
+        already has a connection. The writer is used if the thread has it,
+        so reads inside transaction() see its changes.
+        """
+        if getattr(self._local, 'writer', None) is not None:
+            return self._using('writer')
+        return self._using('reader')
+
+    @contextlib.contextmanager
+    def _using(self, name):
+        """Use connection name, 'writer' or 'reader', in the current thread.
+        Nested uses share the connection, e.g. two iterators which are used
+        in turns. It is checked in when the last of them exits.
+        """
+        local = self._local
+        write = name == 'writer'
+        users = getattr(local, name + '_users', 0)
+        if not users:
+            conn = self.pool.checkout(write=write, timeout=self.timeout)
+            setattr(local, name, conn)
+            setattr(local, name + '_cursor', conn.cursor())
+        setattr(local, name + '_users', users + 1)
+
+        try:
+            yield
+        finally:
+            users = getattr(local, name + '_users') - 1
+            setattr(local, name + '_users', users)
+            if not users:
+                conn = getattr(local, name)
+                setattr(local, name, None)
+                setattr(local, name + '_cursor', None)
+                self.pool.checkin(conn, write=write)
+
+    def _connect(self):
+        """Create connection pool."""
+        self.pool = ConnectionPool(self.db_filename, self.readers,
+                                   self.pragmas)
+        with self._writing():
+            self._create_table()  # Creates table if it does not exist!
+
+
 def main():
     """Example how to use Database class."""
 
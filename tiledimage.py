@@ -0,0 +1,237 @@
+"""
+Transforms images in horizontal strips, so the whole image never has to be
+in memory as RGBA or as NumPy arrays. Used for images which are too large
+to be processed at once, see imagebatch.transform_file().
+
+Input must be uncompressed (PPM, PGM, BMP, uncompressed TIFF). It is
+memory-mapped and only the strip being processed is read. PIL can't decode
+png, jpeg or compressed TIFF partially, so they are refused instead of
+being decoded whole. Output is always written strip by strip as png.
+"""
+
+from PIL import Image
+import numpy as np
+import os
+import struct
+import zlib
+
+
+STRIP_HEIGHT = 256
+
+# Raw modes of uncompressed images which can be memory-mapped and the
+# channel order to get the image's mode from them.
+RAW_MODES = {
+    'L': [0],
+    'RGB': [0, 1, 2],
+    'RGBA': [0, 1, 2, 3],
+    'BGR': [2, 1, 0],
+}
+
+
+class PngWriter(object):
+    """Writes RGBA png image to file object f row by row, keeping only the
+    previous row and the compressor's buffer in memory.
+    """
+    PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+    # Filter type 2 encodes each row as the difference to the previous row.
+    FILTER_UP = 2
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, f, width, height):
+        self.f = f
+        self.width = width
+        self.height = height
+        self._compressor = zlib.compressobj(6)
+        self._previous_row = np.zeros((width, 4), np.uint8)
+        self._buffer = []
+        self._buffer_size = 0
+
+        self.f.write(self.PNG_SIGNATURE)
+        # Bit depth 8, color type 6 (RGBA), default compression, filter
+        # method and no interlacing.
+        header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+        self._write_chunk(b'IHDR', header)
+
+    def write_rows(self, rows):
+        """Writes array of shape (n, width, 4) of RGBA uint8 pixels."""
+        rows = np.asarray(rows, np.uint8)
+        previous = np.concatenate([self._previous_row[np.newaxis],
+                                   rows[:-1]])
+        # uint8 arithmetic wraps around, which is what png expects.
+        filtered = (rows - previous).reshape(len(rows), -1)
+
+        data = np.empty((len(rows), filtered.shape[1] + 1), np.uint8)
+        data[:, 0] = self.FILTER_UP
+        data[:, 1:] = filtered
+        self._previous_row = rows[-1].copy()
+
+        self._buffer.append(self._compressor.compress(data.tobytes()))
+        self._buffer_size += len(self._buffer[-1])
+        if self._buffer_size >= self.CHUNK_SIZE:
+            self._flush()
+
+    def close(self):
+        """Finishes the image. Doesn't close f."""
+        self._buffer.append(self._compressor.flush())
+        self._flush()
+        self._write_chunk(b'IEND', b'')
+
+    def _flush(self):
+        data = b''.join(self._buffer)
+        if data:
+            self._write_chunk(b'IDAT', data)
+        self._buffer = []
+        self._buffer_size = 0
+
+    def _write_chunk(self, chunk_type, data):
+        self.f.write(struct.pack('>I', len(data)))
+        self.f.write(chunk_type)
+        self.f.write(data)
+        crc = zlib.crc32(chunk_type + data) & 0xffffffff
+        self.f.write(struct.pack('>I', crc))
+
+
+def open_image(path):
+    """Opens image without PIL's decompression bomb check, which would
+    refuse the images this module is for. Nothing here decodes the whole
+    image at once.
+    """
+    max_pixels = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        return Image.open(path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = max_pixels
+
+
+def _raw_strips(im):
+    """Returns tuple (raw_mode, strips) where strips is a list of (top,
+    bottom, offset, stride, orientation) tuples of the uncompressed
+    full-width strips which make up the image. Returns None if the image
+    can't be memory-mapped.
+    """
+    if im.mode not in ('L', 'RGB', 'RGBA') or not im.tile:
+        return None
+
+    width, height = im.size
+    strips = []
+    raw_modes = set()
+    for codec, extents, offset, args in im.tile:
+        if not isinstance(args, tuple):
+            args = (args,)
+        raw_modes.add(args[0])
+        stride = args[1] if len(args) > 1 else 0
+        orientation = args[2] if len(args) > 2 else 1
+
+        x0, top, x1, bottom = extents
+        if codec != 'raw' or (x0, x1) != (0, width) or \
+                orientation not in (1, -1):
+            return None
+        strips.append((top, bottom, offset, stride, orientation))
+
+    strips.sort()
+    if len(raw_modes) != 1 or not raw_modes <= set(RAW_MODES):
+        return None
+    # Strips must cover the image without gaps or overlap.
+    tops = [0] + [bottom for _, bottom, _, _, _ in strips[:-1]]
+    if [top for top, _, _, _, _ in strips] != tops or \
+            strips[-1][1] != height:
+        return None
+
+    return raw_modes.pop(), strips
+
+
+def can_read_strips(im):
+    """Returns True if iter_strips() can read the image opened from a
+    file, which needs it to be uncompressed.
+    """
+    return _raw_strips(im) is not None
+
+
+def _map_raw_pixels(im, path):
+    """Returns function read_rows(top, bottom) which reads the rows of an
+    uncompressed image from the memory-mapped file and returns them as PIL
+    image. Returns None if the image is not uncompressed.
+    """
+    raw_strips = _raw_strips(im)
+    if raw_strips is None:
+        return None
+
+    raw_mode, strips = raw_strips
+    width = im.size[0]
+    channels = RAW_MODES[raw_mode]
+    data = np.memmap(path, np.uint8, 'r')
+
+    def strip_rows(top, bottom, offset, stride):
+        stride = stride or width * len(channels)
+        size = (bottom - top) * stride
+        return data[offset:offset + size].reshape(bottom - top, stride)
+
+    # Single strip files, like PPM and BMP, and TIFF files which have many.
+    strips = [(top, bottom, strip_rows(top, bottom, offset, stride),
+               orientation)
+              for top, bottom, offset, stride, orientation in strips]
+
+    def read_rows(top, bottom):
+        parts = []
+        for strip_top, strip_bottom, rows, orientation in strips:
+            start = max(top, strip_top) - strip_top
+            end = min(bottom, strip_bottom) - strip_top
+            if start >= end:
+                continue
+            if orientation == 1:
+                parts.append(rows[start:end])
+            else:
+                # Bottom-up image, like most BMP files.
+                count = strip_bottom - strip_top
+                parts.append(rows[count - end:count - start][::-1])
+
+        strip = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        strip = strip[:, :width * len(channels)]
+        strip = strip.reshape(bottom - top, width, len(channels))
+        pixels = strip[..., channels]
+        if len(channels) == 1:
+            pixels = pixels[..., 0]
+        return Image.fromarray(np.ascontiguousarray(pixels), im.mode)
+
+    return read_rows
+
+
+def iter_strips(path, strip_height=STRIP_HEIGHT):
+    """Yields the image in path as RGBA arrays of at most strip_height
+    rows, from top to bottom. Raises ValueError if the image is compressed,
+    see can_read_strips().
+    """
+    im = open_image(path)
+    width, height = im.size
+
+    read_rows = _map_raw_pixels(im, path)
+    if read_rows is None:
+        raise ValueError("%s is compressed and can't be read in strips" %
+                         path)
+
+    for top in range(0, height, strip_height):
+        bottom = min(top + strip_height, height)
+        yield np.array(read_rows(top, bottom).convert('RGBA'))
+
+
+def transform_file(transform, path, new_path, strip_height=STRIP_HEIGHT):
+    """Same as imagebatch.transform_file() but transforms the image in
+    strips. transform must handle each pixel independently of the others.
+    Returns new_path.
+    """
+    width, height = open_image(path).size
+    # See imagebatch.transform_file() for the temporary name.
+    temp_path = new_path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            writer = PngWriter(f, width, height)
+            for strip in iter_strips(path, strip_height):
+                writer.write_rows(transform(strip))
+            writer.close()
+        os.rename(temp_path, new_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return new_path